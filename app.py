@@ -7,7 +7,8 @@ import os
 import sys
 from flask import Flask
 from flask_socketio import SocketIO
-from py.curl import curl_bp, register_socket_events
+from py.curl import curl_bp, register_socket_events, SHARED_STATE_PATH
+from py.shared_state import create_message_queue
 
 # --- ENVIRONMENT DETECTION ---
 ASYNC_MODE = 'eventlet'
@@ -17,7 +18,13 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'bolt-downloader-secure-key')
 
 # Initialize SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
+# With SHARED_STATE_PATH set, emits fan out through the shared SQLite file so every
+# worker's clients see every job (run e.g. `gunicorn -k eventlet -w 4 app:app`)
+client_manager = create_message_queue(SHARED_STATE_PATH)
+if client_manager:
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE, client_manager=client_manager)
+else:
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
 
 app.register_blueprint(curl_bp)
 register_socket_events(socketio)
@@ -0,0 +1,102 @@
+"""
+Startup benchmark: import time and resident memory per subsystem. Each import
+runs in a fresh interpreter, so every number is a cold import on top of a bare
+Python process, the same cost a new worker pays.
+
+    python py/bench_startup.py --runs 3
+"""
+import argparse
+import importlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUBSYSTEMS = {
+    'flask': ['flask', 'flask_socketio'],
+    'yt_dlp': ['yt_dlp'],
+    'google_auth': ['google.oauth2.credentials', 'google.auth.transport.requests'],
+    'google_api': ['googleapiclient.discovery', 'googleapiclient.http'],
+    'opencv': ['cv2'],
+    'psutil': ['psutil'],
+    # What a worker imports before serving /healthz, then the same with every deferred module forced in
+    'app': ['py.curl'],
+    'app_eager': ['py.curl', '+lazy'],
+}
+
+
+def rss_mb():
+    """Current (not peak) RSS; falls back to peak where /proc is missing."""
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+def child(name):
+    sys.path.insert(0, ROOT)
+    rss0, t0 = rss_mb(), time.perf_counter()
+    try:
+        for module in SUBSYSTEMS[name]:
+            if module == '+lazy':
+                from py.curl import LazyModule
+                import py.curl as curl
+                for value in vars(curl).values():
+                    if isinstance(value, LazyModule) and value.available: value.load()
+            else:
+                importlib.import_module(module)
+    except ImportError as e:
+        print(json.dumps({'subsystem': name, 'missing': str(e)}))
+        return
+    elapsed = time.perf_counter() - t0
+    rss1 = rss_mb()
+    print(json.dumps({
+        'subsystem': name,
+        'import_ms': round(elapsed * 1000, 1),
+        'rss_delta_mb': round(rss1 - rss0, 1),
+        'rss_mb': round(rss1, 1)
+    }))
+
+
+def measure(name, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, __file__, '--child', name], cwd=ROOT,
+                             capture_output=True, text=True).stdout.strip().splitlines()
+        result = json.loads(out[-1]) if out else {'subsystem': name, 'missing': 'no output'}
+        if 'missing' in result: return result
+        samples.append(result)
+    return {
+        'subsystem': name,
+        'import_ms': round(statistics.median(s['import_ms'] for s in samples), 1),
+        'rss_delta_mb': round(statistics.median(s['rss_delta_mb'] for s in samples), 1),
+        'rss_mb': round(statistics.median(s['rss_mb'] for s in samples), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--only', nargs='*', choices=list(SUBSYSTEMS), help='subset of subsystems to measure')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child)
+
+    for name in args.only or SUBSYSTEMS:
+        print(json.dumps(measure(name, max(1, args.runs))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Download write-path benchmark: pooled readinto + pwrite vs. the old
+iter_content + buffered file path. Each mode runs in its own subprocess so the
+peak RSS numbers don't bleed into each other.
+
+    python py/bench_write.py --size-mb 1024
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from writer import CHUNK_SIZE, BufferPool, FileSink, read_chunks
+
+
+def make_source(path, size_mb):
+    block = os.urandom(CHUNK_SIZE)
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def run_legacy(src, dst):
+    with open(src, 'rb', buffering=0) as s, open(dst, 'wb', buffering=CHUNK_SIZE) as f:
+        for chunk in iter(lambda: s.read(CHUNK_SIZE), b''):
+            f.write(chunk)
+
+
+def run_pooled(src, dst, fsync):
+    pool = BufferPool()
+    total = os.path.getsize(src)
+    with open(src, 'rb', buffering=0) as s, FileSink(dst, truncate=True, fsync=fsync) as sink, pool.buffer() as buf:
+        sink.preallocate(total)
+        for view in read_chunks(s, buf):
+            sink.write(view)
+
+
+def child(mode, src, dst, fsync):
+    cpu0, t0 = time.process_time(), time.time()
+    if mode == 'legacy': run_legacy(src, dst)
+    else: run_pooled(src, dst, fsync)
+    cpu, wall = time.process_time() - cpu0, time.time() - t0
+    gb = os.path.getsize(src) / 1024 ** 3
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+    print(json.dumps({
+        'mode': mode,
+        'mb_per_s': round(gb * 1024 / max(wall, 1e-6), 1),
+        'cpu_s_per_gb': round(cpu / max(gb, 1e-9), 3),
+        'peak_rss_mb': round(rss_mb, 1)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--fsync', default='none', choices=('none', 'interval', 'close'))
+    parser.add_argument('--child', nargs=3, metavar=('MODE', 'SRC', 'DST'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(*args.child, args.fsync)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'source.bin')
+        make_source(src, args.size_mb)
+        for mode in ('legacy', 'pooled'):
+            dst = os.path.join(tmp, f'{mode}.bin')
+            subprocess.run([sys.executable, __file__, '--fsync', args.fsync, '--child', mode, src, dst], check=True)
+            os.remove(dst)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Library sync check against a local fake of Drive's files.list and changes.list.
+Covers a paginated full scan, non-library files being left out, paginated change
+polls with edits and removals, resuming from the saved state, and an expired page
+token forcing a relist. Exits non-zero on failure.
+
+    python py/check_sync.py
+    python py/check_sync.py --serve 9999   # just run the fake; DRIVE_API_ENDPOINT=http://127.0.0.1:9999/drive/v3/
+"""
+import argparse
+import http.server
+import json
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py.drive_sync import DriveLibrarySync
+from py.library import LibraryStore
+
+PAGE_LIMIT = 2  # Drive may return fewer results than pageSize; a small page forces pagination
+
+
+class FakeDrive:
+    """In-memory files plus a change log, served on Drive's v3 paths."""
+
+    def __init__(self):
+        self.files = {}
+        self.changes = []
+        self.expired_before = 0
+        self.log = []
+
+    # --- DATA ---
+
+    def put(self, file_id, name, **fields):
+        f = dict({'id': file_id, 'name': name, 'size': '1024', 'mimeType': 'video/mp4', 'createdTime': '2024-01-02T03:04:05.000Z',
+                  'webViewLink': f"https://drive.example/{file_id}", 'trashed': False, 'ownedByMe': True}, **fields)
+        self.files[file_id] = f
+        self.changes.append({'fileId': file_id, 'removed': False, 'file': dict(f)})
+
+    def update(self, file_id, **fields):
+        self.put(file_id, **dict(self.files[file_id], **fields))
+
+    def delete(self, file_id):
+        self.files.pop(file_id, None)
+        self.changes.append({'fileId': file_id, 'removed': True})
+
+    # --- SERVER ---
+
+    def _page(self, items, token, **done):
+        start = int(token or 0)
+        page = items[start:start + PAGE_LIMIT]
+        end = start + len(page)
+        return page, ({'nextPageToken': str(end)} if end < len(items) else done)
+
+    def handle(self, path, query):
+        self.log.append(path)
+        if path == '/drive/v3/changes/startPageToken':
+            return 200, {'startPageToken': str(len(self.changes))}
+        if path == '/drive/v3/files':
+            # The query is not evaluated: the client must drop non-library files itself
+            page, extra = self._page(list(self.files.values()), query.get('pageToken'))
+            return 200, dict({'files': page}, **extra)
+        if path == '/drive/v3/changes':
+            token = int(query.get('pageToken', '0'))
+            if token < self.expired_before:
+                return 410, {'error': {'code': 410, 'message': 'Page token expired'}}
+            page, extra = self._page(self.changes, token, newStartPageToken=str(len(self.changes)))
+            return 200, dict({'changes': page}, **extra)
+        return 404, {'error': {'code': 404, 'message': 'Not found'}}
+
+    def start(self, port=0):
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args): pass
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status, payload = fake.handle(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}/drive/v3/"
+
+    def calls(self, path):
+        return sum(1 for p in self.log if p == path)
+
+
+def build_service(endpoint):
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+    return build('drive', 'v3', credentials=Credentials('fake-token'), client_options={'api_endpoint': endpoint},
+                 cache_discovery=False)
+
+
+def run_checks():
+    fake = FakeDrive()
+    service = build_service(fake.start())
+    results = []
+
+    def check(name, ok):
+        results.append(ok)
+        print(json.dumps({'check': name, 'ok': bool(ok)}))
+
+    def library(store):
+        return {e['gdrive_id']: e['name'] for e in store.snapshot()}
+
+    for i in range(5):
+        fake.put(f"vid{i}", f"video{i}.mp4")
+    fake.put('folder1', 'Folder', mimeType='application/vnd.google-apps.folder')
+    fake.put('doc1', 'Notes', mimeType='application/vnd.google-apps.document')
+    fake.put('shared1', 'shared.mp4', ownedByMe=False)
+    fake.put('trash1', 'old.mp4', trashed=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, 'library_state.json')
+        updates = []
+        store = LibraryStore()
+        sync = DriveLibrarySync(store, lambda: service, state_path=state_path, on_update=updates.append)
+
+        # 1. First run: a paginated files.list seeds the library
+        fake.log.clear()
+        sync.sync_once()
+        check('full_scan_paginates', library(store) == {f"vid{i}": f"video{i}.mp4" for i in range(5)}
+              and fake.calls('/drive/v3/files') == 5 and updates[-1] == {'full': True, 'count': 5})
+        check('non_library_files_skipped', not {'folder1', 'doc1', 'shared1', 'trash1'} & set(library(store)))
+
+        # 2. Later runs only read changes, several pages of them
+        fake.log.clear()
+        fake.put('vid5', 'video5.mp4')
+        fake.update('vid0', name='renamed.mp4')
+        fake.update('vid1', trashed=True)
+        fake.delete('vid2')
+        fake.update('vid3', ownedByMe=False)
+        fake.put('doc2', 'Sheet', mimeType='application/vnd.google-apps.spreadsheet')
+        sync.sync_once()
+        expected = {'vid0': 'renamed.mp4', 'vid4': 'video4.mp4', 'vid5': 'video5.mp4'}
+        check('poll_changes_paginates', library(store) == expected and fake.calls('/drive/v3/files') == 0
+              and fake.calls('/drive/v3/changes') == 3)
+        check('removals_applied', sorted(updates[-1]['removed']) == ['vid1', 'vid2', 'vid3'])
+
+        # 3. A restarted worker picks up the saved token instead of relisting
+        fake.log.clear()
+        fake.put('vid6', 'video6.mp4')
+        restarted = DriveLibrarySync(LibraryStore(), lambda: service, state_path=state_path)
+        restarted.lead()
+        restarted.sync_once()
+        check('resume_from_state', library(restarted.store) == dict(expected, vid6='video6.mp4')
+              and fake.calls('/drive/v3/files') == 0)
+
+        # 4. Drive no longer accepts the token: the cycle fails, the next one relists
+        fake.log.clear()
+        fake.expired_before = len(fake.changes) + 1
+        fake.put('vid7', 'video7.mp4')
+        try:
+            restarted.sync_once()
+            expired = False
+        except Exception:
+            expired = restarted.page_token is None
+        try:
+            relisted = restarted.sync_once()
+        except Exception:
+            relisted = False
+        check('expired_token_relists', expired and relisted and fake.calls('/drive/v3/files') > 0
+              and library(restarted.store) == dict(expected, vid6='video6.mp4', vid7='video7.mp4'))
+
+    fake.server.shutdown()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--serve', type=int, metavar='PORT', help='run the fake endpoint until interrupted')
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        endpoint = FakeDrive().start(args.serve)
+        print(f"Fake Drive endpoint: DRIVE_API_ENDPOINT={endpoint}")
+        threading.Event().wait()
+    sys.exit(0 if run_checks() else 1)
+
+
+if __name__ == '__main__':
+    main()
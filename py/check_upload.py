@@ -0,0 +1,179 @@
+"""
+Resumable upload check against a local fake of Drive's upload endpoint. Covers
+chunk commits, a 503 followed by a `bytes */N` status query, resuming from the
+sidecar after the process dies, and an expired session. Exits non-zero on failure.
+
+    python py/check_upload.py
+    python py/check_upload.py --serve 9999   # just run the fake; DRIVE_API_ENDPOINT=http://127.0.0.1:9999/drive/v3/
+"""
+import argparse
+import http.server
+import json
+import os
+import re
+import socketserver
+import sys
+import tempfile
+import threading
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import py.drive_upload as drive_upload
+from py.drive_upload import ResumableUpload, upload_state_path
+from py.netpool import new_session
+
+CHUNK = 256 * 1024
+
+
+class FakeDrive:
+    """Same paths and status codes as Drive's resumable uploads, with scripted failures."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.log = []
+        self.fail_next = 0
+
+    def start(self, port=0):
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args): pass
+
+            def reply(self, code, body=b'', headers=None):
+                self.send_response(code)
+                for k, v in (headers or {}).items(): self.send_header(k, v)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if url.path != '/upload/drive/v3/files' or parse_qs(url.query).get('uploadType') != ['resumable']:
+                    return self.reply(404)
+                sid = uuid.uuid4().hex
+                fake.sessions[sid] = {'data': bytearray(), 'size': int(self.headers['X-Upload-Content-Length']),
+                                      'meta': json.loads(body)}
+                fake.log.append(('start', sid))
+                host = self.headers.get('Host')
+                self.reply(200, headers={'Location': f"http://{host}/upload/drive/v3/files?uploadType=resumable&upload_id={sid}"})
+
+            def do_PUT(self):
+                sid = parse_qs(urlsplit(self.path).query).get('upload_id', [''])[0]
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                content_range = self.headers.get('Content-Range', '')
+                fake.log.append(('put', content_range))
+                session = fake.sessions.get(sid)
+                if not session: return self.reply(404)
+                if fake.fail_next:
+                    fake.fail_next -= 1
+                    return self.reply(503)
+                m = re.match(r'bytes (\d+)-(\d+)/(\d+)', content_range)
+                if m and int(m.group(1)) == len(session['data']):
+                    session['data'] += body
+                if len(session['data']) >= session['size']:
+                    resource = {'id': f"file_{sid[:8]}", 'name': session['meta'].get('name'), 'webViewLink': ''}
+                    return self.reply(200, json.dumps(resource).encode(), {'Content-Type': 'application/json'})
+                committed = len(session['data'])
+                self.reply(308, headers={'Range': f"bytes=0-{committed - 1}"} if committed else {})
+
+        class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        # The same form DRIVE_API_ENDPOINT takes for googleapiclient
+        return f"http://127.0.0.1:{self.server.server_port}/drive/v3/"
+
+    def received(self):
+        return bytes(list(self.sessions.values())[-1]['data'])
+
+
+class Crash(Exception):
+    pass
+
+
+def run_checks():
+    drive_upload.backoff_delay = lambda attempt: 0.01
+    fake = FakeDrive()
+    endpoint = fake.start()
+    http = new_session()
+    results = []
+
+    def check(name, ok):
+        results.append(ok)
+        print(json.dumps({'check': name, 'ok': bool(ok)}))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'video.bin')
+        data = os.urandom(5 * CHUNK + 1234)
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        new_upload = lambda: ResumableUpload(http, path, 'video.bin', None, lambda: {}, endpoint=endpoint, chunk_size=CHUNK)
+
+        # 1. Plain upload: every chunk is committed in order
+        resource = new_upload().upload()
+        puts = [r for kind, r in fake.log if kind == 'put']
+        check('chunk_commit', resource and fake.received() == data and len(puts) == 6 and puts[0] == f"bytes 0-{CHUNK - 1}/{len(data)}")
+        check('sidecar_cleared', not os.path.exists(upload_state_path(path)))
+
+        # 2. A 503 mid-upload: back off, ask Drive what it has, continue from there
+        fake.log.clear()
+        fake.fail_next = 1
+        upload = new_upload()
+        resource = upload.upload()
+        puts = [r for kind, r in fake.log if kind == 'put']
+        check('retry_on_503', resource and fake.received() == data and upload.retries == 1)
+        check('status_query_after_error', f"bytes */{len(data)}" in puts)
+
+        # 3. The process dies after two chunks; a new one resumes the session from the sidecar
+        fake.log.clear()
+
+        def crash_after_two(status):
+            if status.resumable_progress >= 2 * CHUNK: raise Crash()
+
+        try:
+            new_upload().upload(crash_after_two)
+        except Crash:
+            pass
+        saved = json.load(open(upload_state_path(path)))
+        resource = new_upload().upload()
+        starts = [r for kind, r in fake.log if kind == 'start']
+        puts = [r for kind, r in fake.log if kind == 'put']
+        check('sidecar_offset_saved', saved['offset'] == 2 * CHUNK)
+        check('resume_from_sidecar', resource and len(starts) == 1 and fake.received() == data
+              and puts[puts.index(f"bytes */{len(data)}") + 1].startswith(f"bytes {2 * CHUNK}-"))
+
+        # 4. The saved session is gone on Drive's side: start a new one
+        fake.log.clear()
+        try:
+            new_upload().upload(crash_after_two)
+        except Crash:
+            pass
+        fake.sessions.clear()
+        resource = new_upload().upload()
+        check('expired_session_restarts', resource and fake.received() == data
+              and len([1 for kind, _ in fake.log if kind == 'start']) == 2)
+
+    fake.server.shutdown()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--serve', type=int, metavar='PORT', help='run the fake endpoint until interrupted')
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        endpoint = FakeDrive().start(args.serve)
+        print(f"Fake Drive upload endpoint: DRIVE_API_ENDPOINT={endpoint}")
+        threading.Event().wait()
+    sys.exit(0 if run_checks() else 1)
+
+
+if __name__ == '__main__':
+    main()
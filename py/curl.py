@@ -1,36 +1,43 @@
 from flask import Blueprint, request, render_template, jsonify, Response, stream_with_context, send_from_directory
 from flask_socketio import emit
-import requests
 import os
 import uuid
 import time
 import re
 import mimetypes
-import psutil 
 import io
 import threading
 import tempfile
-import yt_dlp
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, unquote, parse_qs
+from py.netpool import http, new_session, pool_stats
+from py.library import LibraryStore, SQLiteLibraryStore
+from py.shared_state import WORKER_ID, create_state
+from py.drive_sync import DriveLibrarySync
+from py.drive_batch import execute_batched, PermissionBatcher
+from py.drive_upload import ResumableUpload, api_root, upload_state_path
+from py.probe import ProbeResult, ProbeCache, probe_url
+from py.writer import BufferPool, FileSink, raw_reader, read_chunks
+from py.mirrors import MirrorDownload, source_label, verify_sources, race_sources, plan_segments, load_segment_state
+from py.thumbnails import PreviewCache, PREVIEW_FILES
+from py.lazy import LazyModule
+from py.watchdog import ThroughputWatchdog, TransientError, RETRYABLE_ERRORS, MAX_RECONNECTS, backoff_delay, is_retryable_status
 
 # --- DEPENDENCY CHECKS ---
+# Heavy subsystems are imported on first use; see py/lazy.py
 socketio_instance = None
+yt_dlp = LazyModule('yt_dlp')
+cv2 = LazyModule('cv2')
+psutil = LazyModule('psutil')
 # 1. OpenCV Check
-try:
-    import cv2
-    OPENCV_AVAILABLE = True
-except ImportError:
-    cv2 = None
-    OPENCV_AVAILABLE = False
+if not cv2.available:
     print("System: OpenCV (cv2) not found. Video resolution probing will fallback to metadata.")
 
 # --- GOOGLE DRIVE IMPORTS ---
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+google_auth_requests = LazyModule('google.auth.transport.requests')
+google_credentials = LazyModule('google.oauth2.credentials')
+drive_discovery = LazyModule('googleapiclient.discovery')
 
 curl_bp = Blueprint('curl', __name__)
 
@@ -44,10 +51,28 @@ if os.path.basename(BASE_DIR) == 'py':
 DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
 TOKEN_PATH = os.path.join(BASE_DIR, 'token.json')
 COOKIES_PATH = os.path.join(BASE_DIR, 'cookies.txt')  # --- ADDED: Cookie path ---
+LIBRARY_STATE_PATH = os.path.join(BASE_DIR, 'library_state.json')
+PREVIEW_DIR = os.path.join(BASE_DIR, 'previews')
+
+# Optional override so the Drive client can be pointed at a local fake API
+DRIVE_API_ENDPOINT = os.environ.get('DRIVE_API_ENDPOINT')
+# Batches don't follow api_endpoint on their own, so they are pointed at the same host explicitly
+DRIVE_BATCH_URI = f"{api_root(DRIVE_API_ENDPOINT)}batch/drive/v3" if DRIVE_API_ENDPOINT else None
+DRIVE_SYNC_INTERVAL = int(os.environ.get('DRIVE_SYNC_INTERVAL', 20))
+SHARED_STATE_PATH = os.environ.get('SHARED_STATE_PATH')
+# none | interval | close -- how often downloaded data is forced to disk
+DOWNLOAD_FSYNC = os.environ.get('DOWNLOAD_FSYNC', 'none')
 
 active_downloads = {}
-download_history = [] 
+buffer_pool = BufferPool()
+# Poster frames and seek sprites, rendered from the local file before it is removed
+preview_cache = PreviewCache(PREVIEW_DIR)
+# Per-process by default; SHARED_STATE_PATH moves jobs, controls and the library into one SQLite file for multi-worker runs
+shared_state = create_state(SHARED_STATE_PATH)
+download_history = SQLiteLibraryStore(SHARED_STATE_PATH) if SHARED_STATE_PATH else LibraryStore()
+library_sync = None
 SCOPES = ['https://www.googleapis.com/auth/drive'] 
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
 
 def safe_filename(name):
     """Sanitizes filename to be safe for filesystems."""
@@ -115,7 +140,7 @@ def get_credentials():
     creds = None
     if os.path.exists(TOKEN_PATH):
         try:
-            creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+            creds = google_credentials.Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
         except Exception as e:
             print(f"Token Error: {e}")
             return None
@@ -123,7 +148,7 @@ def get_credentials():
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             try:
-                creds.refresh(Request())
+                creds.refresh(google_auth_requests.Request())
                 with open(TOKEN_PATH, 'w') as token:
                     token.write(creds.to_json())
             except Exception as e:
@@ -134,11 +159,21 @@ def get_credentials():
             return None
     return creds
 
+_drive_local = threading.local()
+
 def get_gdrive_service():
-    """Builds the Drive Service."""
+    """Builds the Drive Service, reusing this thread's instance (and its keep-alive connection) while the token is unchanged."""
     creds = get_credentials()
     if not creds: return None
-    return build('drive', 'v3', credentials=creds)
+    # httplib2 is not thread-safe, so the cache is per thread
+    if getattr(_drive_local, 'token', None) == creds.token:
+        return _drive_local.service
+    if DRIVE_API_ENDPOINT:
+        service = drive_discovery.build('drive', 'v3', credentials=creds, client_options={'api_endpoint': DRIVE_API_ENDPOINT})
+    else:
+        service = drive_discovery.build('drive', 'v3', credentials=creds)
+    _drive_local.service, _drive_local.token = service, creds.token
+    return service
 
 def get_file_metadata(file_id):
     """Fetches name, mimeType, and video metadata from Drive."""
@@ -164,39 +199,32 @@ def srt_to_vtt(srt_content):
         print(f"Conversion Error: {e}")
         return "WEBVTT\n\n"
 
+def drive_auth_headers():
+    """Fresh per call, so long uploads pick up a refreshed token."""
+    creds = get_credentials()
+    return {"Authorization": f"Bearer {creds.token}"} if creds else {}
+
 def upload_file_to_drive(filepath, filename, progress_callback=None):
-    """Uploads file with progress tracking."""
-    service = get_gdrive_service()
-    if not service: return None
+    """Uploads file with progress tracking, resuming this file's previous session if Drive still has it."""
+    if not get_credentials(): return None
     
     try:
-        file_metadata = {'name': filename}
-        media = MediaFileUpload(filepath, resumable=True, chunksize=2*1024*1024) 
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        upload = ResumableUpload(http, filepath, filename, mimetype, drive_auth_headers,
+                                 endpoint=DRIVE_API_ENDPOINT, chunk_size=UPLOAD_CHUNK_SIZE)
+        response = upload.upload(progress_callback)
         
-        request = service.files().create(
-            body=file_metadata, 
-            media_body=media, 
-            fields='id, webViewLink, webContentLink'
-        )
-        
-        response = None
-        while response is None:
-            status, response = request.next_chunk()
-            if status and progress_callback:
-                progress_callback(status)
-        
-        try:
-            service.permissions().create(
-                fileId=response.get('id'),
-                body={'type': 'anyone', 'role': 'reader'}
-            ).execute()
-        except: pass
+        # Grants are batched so many uploads finishing together share one round trip
+        permission_batcher.submit(response.get('id'))
 
         return response
     except Exception as e:
+        # The session sidecar stays behind, so the next attempt for this file resumes it
         print(f"GDrive Upload Error: {e}")
         return None
 
+permission_batcher = PermissionBatcher(get_gdrive_service, batch_uri=DRIVE_BATCH_URI)
+
 def delete_drive_file(file_id):
     """Deletes a file from Google Drive."""
     service = get_gdrive_service()
@@ -210,6 +238,21 @@ def delete_drive_file(file_id):
 
 # --- LOCAL FILE UTILITIES ---
 
+def release_local_file(filepath, previews, file_id=None):
+    """
+    Files the preview render under file_id (or drops it), then deletes the local copy
+    and its upload sidecar once the renderer has stopped reading them. Never blocks.
+    """
+    def done(ok):
+        if filepath:
+            for p in (filepath, upload_state_path(filepath)):
+                if os.path.exists(p): os.remove(p)
+        if ok and socketio_instance:
+            socketio_instance.emit('library_updated', {'full': False, 'preview': file_id})
+
+    if file_id: preview_cache.commit(previews, file_id, then=done)
+    else: preview_cache.discard(previews, then=done)
+
 def extract_gdrive_id(url):
     """Extracts Google Drive File ID from URL."""
     patterns = [
@@ -271,6 +314,45 @@ def get_smart_filename(url, response_headers=None, custom=None):
 
     return f"download_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
+# --- PROBES ---
+
+probe_cache = ProbeCache()
+
+def probe_filename(result):
+    """Filename for a probe: Content-Disposition first, then the original and redirected URL paths."""
+    name = extract_filename_from_headers(result['headers'])
+    if name: return name
+    for candidate in (result['url'], result['final_url']):
+        name = extract_filename_from_url(candidate)
+        if name != 'download_file': return name
+    return None
+
+def probe_drive(file_id):
+    """Drive files are probed through the metadata API instead of HEAD."""
+    meta = get_file_metadata(file_id)
+    if meta.get('name') in (None, "Unknown"):
+        raise ValueError("Drive metadata unavailable")
+    api_url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
+    return ProbeResult(
+        url=api_url,
+        final_url=api_url,
+        status=200,
+        method='drive_metadata',
+        filename=meta['name'],
+        size=int(meta.get('size') or 0),
+        accept_ranges=True,
+        etag=None,
+        last_modified=None,
+        headers={}
+    )
+
+def get_drive_probe(file_id):
+    return probe_cache.get_or_probe(f"gdrive:{file_id}", lambda: probe_drive(file_id))
+
+def get_direct_probe(url, http_client=None, timeout=10):
+    """Cached probe for a plain HTTP(S) URL via HEAD, or a ranged GET when HEAD is unsupported."""
+    return probe_cache.get_or_probe(url, lambda: probe_url(http_client or http, url, timeout=timeout, name_resolver=probe_filename))
+
 def format_speed(speed):
     if speed < 1024: return f"{speed:.1f} B/s"
     elif speed < 1024**2: return f"{speed/1024:.1f} KB/s"
@@ -307,12 +389,29 @@ def youtube_view():
 def healthz():
     return jsonify({"status": "ok"}), 200
 
+@curl_bp.route("/features", methods=["GET"])
+def features_route():
+    # Answered from installed packages only, so asking never pays for the imports
+    return jsonify({
+        'youtube': yt_dlp.available,
+        'drive': drive_discovery.available and google_credentials.available,
+        'video_probe': cv2.available,
+        'previews': preview_cache.enabled,
+        'loaded': {m.module_name: m.loaded for m in (yt_dlp, drive_discovery, google_credentials, cv2, psutil)}
+    })
+
+@curl_bp.route("/pool_stats", methods=["GET"])
+def pool_stats_route():
+    return jsonify(pool_stats())
+
 # --- YOUTUBE ROUTES ---
 
 @curl_bp.route('/youtube/fetch_info', methods=['POST'])
 def fetch_info():
     data = request.get_json()
     url = data.get('url')
+    if not yt_dlp.available:
+        return jsonify({'success': False, 'error': 'YouTube support is not installed (yt-dlp)'})
     
     try:
         with yt_dlp.YoutubeDL(get_ydl_opts()) as ydl:
@@ -351,11 +450,14 @@ def youtube_download_task():
 
     if not url or not res:
         return jsonify(success=False, error="Invalid request")
+    if not yt_dlp.available:
+        return jsonify(success=False, error="YouTube support is not installed (yt-dlp)")
 
     download_id = f"yt_{int(time.time())}"
 
     def task():
         filepath = None
+        previews = None
         try:
             # ---- DOWNLOAD (NO SOCKET EMIT, JUST BACKGROUND) ----
             # We don't want to block the user or confuse them with "Downloading 0%" while YT processes
@@ -366,6 +468,7 @@ def youtube_download_task():
                 filename = os.path.basename(filepath)
 
             total_size = os.path.getsize(filepath)
+            previews = preview_cache.submit(filepath)
 
             # ---- START UPLOAD (SHOW ACTIVE DOWNLOAD) ----
             if socketio_instance:
@@ -410,8 +513,7 @@ def youtube_download_task():
                     "filename": filename
                 })
 
-            if filepath and os.path.exists(filepath):
-                os.remove(filepath)
+            release_local_file(filepath, previews, drive_file.get("id") if drive_file else None)
 
         except Exception as e:
             if socketio_instance:
@@ -420,8 +522,7 @@ def youtube_download_task():
                     "error": str(e)
                 })
 
-            if filepath and os.path.exists(filepath):
-                os.remove(filepath)
+            release_local_file(filepath, previews)
 
     threading.Thread(target=task, daemon=True).start()
     return jsonify(success=True)
@@ -434,44 +535,184 @@ def detect_filename_route():
     url = data.get('url', '')
     if not url: return jsonify({'success': False})
     
+    # The probe is cached, so the download that usually follows starts without re-probing
     gid = extract_gdrive_id(url)
     if gid:
-        meta = get_file_metadata(gid)
-        name = meta.get('name')
-        if name and name != "Unknown":
-            return jsonify({'success': True, 'filename': name})
+        try:
+            probe = get_drive_probe(gid)
+            return jsonify({'success': True, 'filename': probe['filename'], 'size': probe['size'], 'resumable': True})
+        except Exception: pass
             
     try:
-        head = requests.head(url, timeout=5, allow_redirects=True)
-        name = extract_filename_from_headers(head.headers)
-        if not name: name = extract_filename_from_url(url)
-        return jsonify({'success': True, 'filename': name})
+        probe = get_direct_probe(url, timeout=5)
+        name = probe['filename'] or extract_filename_from_url(url)
+        return jsonify({'success': True, 'filename': name, 'size': probe['size'], 'resumable': probe.resumable})
     except:
         return jsonify({'success': True, 'filename': get_smart_filename(url)})
 
 @curl_bp.route("/list_files", methods=["GET"])
 def list_files_route():
-    return jsonify({'files': list(reversed(download_history))})
+    files = list(reversed(download_history.snapshot()))
+    cached = preview_cache.available()
+    for f in files:
+        if f.get('gdrive_id') in cached: f['preview'] = True
+    return jsonify({'files': files})
+
+@curl_bp.route("/preview/<file_id>/<name>", methods=["GET"])
+def preview_route(file_id, name):
+    # Previews for an ID never change, so browsers may keep them for good
+    path = preview_cache.path(file_id)
+    if name not in PREVIEW_FILES or not path or not os.path.exists(os.path.join(path, name)):
+        return jsonify({'error': 'Not found'}), 404
+    response = send_from_directory(path, name, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@curl_bp.route("/sync_library", methods=["POST"])
+def sync_library_route():
+    if not library_sync: return jsonify({'success': False, 'error': 'Sync not running'})
+    # A second worker syncing would race the leader over the page token
+    if not library_sync.lead(): return jsonify({'success': False, 'error': 'Sync is handled by another worker'})
+    try:
+        return jsonify({'success': library_sync.sync_once(), 'files': len(download_history)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def remove_local_copy(filename):
+    try:
+        path = os.path.join(DOWNLOAD_DIR, filename)
+        if filename and os.path.exists(path): os.remove(path)
+    except: pass
 
 @curl_bp.route("/delete_file", methods=["POST"])
 def delete_file_route():
-    data = request.get_json()
-    filename = data.get('filename')
-    global download_history
+    data = request.get_json() or {}
+    # Keyed like the library (Drive ID, or local:<name>); names are not unique
+    key = data.get('id')
     
-    target_file = next((f for f in download_history if f['name'] == filename), None)
-    if target_file and target_file.get('gdrive_id'):
+    target_file = download_history.get(key) if key else None
+    if not target_file: return jsonify({'success': False, 'error': 'Unknown file'})
+    if target_file.get('gdrive_id'):
         delete_drive_file(target_file['gdrive_id'])
+        preview_cache.remove(target_file['gdrive_id'])
     
-    download_history = [f for f in download_history if f['name'] != filename]
-    
-    try:
-        path = os.path.join(DOWNLOAD_DIR, filename)
-        if os.path.exists(path): os.remove(path)
-    except: pass
+    download_history.remove(key)
+    remove_local_copy(target_file.get('name'))
     
     return jsonify({'success': True})
 
+# --- BULK LIBRARY ROUTES ---
+
+def bulk_list(field):
+    """The JSON body's list under field, or None when the body is not shaped like {field: [...]}."""
+    data = request.get_json(silent=True)
+    values = data.get(field) if isinstance(data, dict) else None
+    return values if isinstance(values, list) else None
+
+def split_ids(values):
+    """De-duplicated file ids, plus a failed result for every entry that is not one."""
+    valid = lambda v: isinstance(v, str) and v
+    ids = list(dict.fromkeys(v for v in values if valid(v)))
+    return ids, [{'id': v, 'success': False, 'error': 'Missing file id'} for v in values if not valid(v)]
+
+def bulk_response(ids, results, rejected=()):
+    items = []
+    for key in ids:
+        res = results.get(key, {'success': False, 'error': 'Unknown file'})
+        item = {'id': key, 'success': res['success']}
+        if not res['success']: item['error'] = res.get('error')
+        items.append(item)
+    # Inputs refused before reaching Drive still get a result each
+    items.extend(rejected)
+    if socketio_instance and any(i['success'] for i in items):
+        socketio_instance.emit('library_updated', {'full': False, 'bulk': True})
+    return jsonify({'success': all(i['success'] for i in items), 'results': items})
+
+@curl_bp.route("/bulk/delete", methods=["POST"])
+def bulk_delete_route():
+    values = bulk_list('ids')
+    if values is None: return jsonify({'success': False, 'error': 'ids must be a list'}), 400
+    ids, rejected = split_ids(values)
+    results = {}
+    drive_items = []
+    for key in ids:
+        entry = download_history.get(key)
+        if entry and entry.get('gdrive_id'):
+            drive_items.append((key, entry))
+        elif entry:
+            download_history.remove(key)
+            remove_local_copy(entry.get('name'))
+            results[key] = {'success': True}
+
+    # 404 means it is already gone from Drive, which is what we wanted
+    results.update(execute_batched(
+        get_gdrive_service, drive_items,
+        lambda service, fid, _: service.files().delete(fileId=fid),
+        ok_statuses=(404,), batch_uri=DRIVE_BATCH_URI
+    ))
+    for key, entry in drive_items:
+        if results[key]['success']:
+            download_history.remove(key)
+            remove_local_copy(entry.get('name'))
+            preview_cache.remove(key)
+    return bulk_response(ids, results, rejected)
+
+@curl_bp.route("/bulk/share", methods=["POST"])
+def bulk_share_route():
+    values = bulk_list('ids')
+    if values is None: return jsonify({'success': False, 'error': 'ids must be a list'}), 400
+    ids, rejected = split_ids(values)
+    results = execute_batched(
+        get_gdrive_service, [(fid, None) for fid in ids],
+        lambda service, fid, _: service.permissions().create(
+            fileId=fid, body={'type': 'anyone', 'role': 'reader'}, fields='id'
+        ),
+        batch_uri=DRIVE_BATCH_URI
+    )
+    return bulk_response(ids, results, rejected)
+
+@curl_bp.route("/bulk/unshare", methods=["POST"])
+def bulk_unshare_route():
+    values = bulk_list('ids')
+    if values is None: return jsonify({'success': False, 'error': 'ids must be a list'}), 400
+    ids, rejected = split_ids(values)
+    # 'anyoneWithLink' is the fixed permission ID Drive uses for public link sharing
+    results = execute_batched(
+        get_gdrive_service, [(fid, None) for fid in ids],
+        lambda service, fid, _: service.permissions().delete(fileId=fid, permissionId='anyoneWithLink'),
+        ok_statuses=(404,), batch_uri=DRIVE_BATCH_URI
+    )
+    return bulk_response(ids, results, rejected)
+
+@curl_bp.route("/bulk/rename", methods=["POST"])
+def bulk_rename_route():
+    items = bulk_list('items')
+    if items is None: return jsonify({'success': False, 'error': 'items must be a list'}), 400
+    renames = {}
+    rejected = []
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        fid, name = item.get('id'), item.get('name')
+        name = re.sub(r'[<>:"/\\|?*]', '_', name.strip()) if isinstance(name, str) else ''
+        if not fid or not isinstance(fid, str):
+            rejected.append({'id': fid, 'success': False, 'error': 'Missing file id'})
+        elif not name:
+            rejected.append({'id': fid, 'success': False, 'error': 'Invalid name'})
+        else:
+            renames[fid] = name
+
+    results = execute_batched(
+        get_gdrive_service, list(renames.items()),
+        lambda service, fid, name: service.files().update(
+            fileId=fid, body={'name': name}, fields='id, name, webViewLink'
+        ),
+        batch_uri=DRIVE_BATCH_URI
+    )
+    for fid, res in results.items():
+        if res['success'] and download_history.get(fid):
+            download_history.upsert({'gdrive_id': fid, 'name': renames[fid]})
+    return bulk_response(list(renames), results, rejected)
+
 @curl_bp.route("/upload_sub", methods=["POST"])
 def upload_sub():
     if 'file' not in request.files: return jsonify({'success': False, 'error': 'No file'})
@@ -506,10 +747,10 @@ def get_video_meta(file_id):
     
     try:
         tmp_path = None
-        if OPENCV_AVAILABLE:
+        if cv2.available:
             with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp_file:
                 tmp_path = tmp_file.name
-                with requests.get(stream_url, headers=headers, stream=True) as r:
+                with http.get(stream_url, headers=headers, stream=True) as r:
                     for chunk in r.iter_content(chunk_size=4096):
                         tmp_file.write(chunk)
                         if tmp_file.tell() > 10 * 1024 * 1024: break
@@ -517,7 +758,7 @@ def get_video_meta(file_id):
         width, height = 0, 0
         source = 'metadata'
 
-        if OPENCV_AVAILABLE and tmp_path:
+        if cv2.available and tmp_path:
             try:
                 cap = cv2.VideoCapture(tmp_path)
                 if cap.isOpened():
@@ -555,8 +796,9 @@ def stream_drive_content(file_id, as_attachment=False):
     creds = get_credentials()
     if not creds: return "Credentials error", 401
 
-    meta = get_file_metadata(file_id)
-    raw_name = meta.get('name', 'downloaded_file')
+    # Players issue many range requests per file; the cached probe saves a metadata call on each
+    try: raw_name = get_drive_probe(file_id)['filename']
+    except: raw_name = None
     if not raw_name: raw_name = "downloaded_file"
     
     filename = raw_name.lower()
@@ -568,7 +810,7 @@ def stream_drive_content(file_id, as_attachment=False):
     if not as_attachment and range_header: 
         headers['Range'] = range_header
 
-    req = requests.get(url, headers=headers, stream=True)
+    req = http.get(url, headers=headers, stream=True)
     
     if not as_attachment and filename.endswith('.srt'):
         return Response(srt_to_vtt(req.content), content_type="text/vtt")
@@ -591,8 +833,17 @@ def stream_drive_content(file_id, as_attachment=False):
         ('Content-Disposition', f'{disposition}; filename="{ascii_name}"')
     )
 
-    return Response(stream_with_context(req.iter_content(chunk_size=65536)), 
-                   status=req.status_code, headers=response_headers, content_type=content_type)
+    def relay():
+        try:
+            for chunk in req.iter_content(chunk_size=65536): yield chunk
+        finally:
+            req.close()
+
+    response = Response(stream_with_context(relay()), 
+                        status=req.status_code, headers=response_headers, content_type=content_type)
+    # The generator's finally never runs if the client leaves before the body starts; this always does
+    response.call_on_close(req.close)
+    return response
 
 @curl_bp.route('/stream/<filename>')
 def stream_file(filename):
@@ -629,92 +880,187 @@ def stream_file(filename):
 # --- CONTROLLER ---
 
 class DownloadController:
-    def __init__(self, download_id, url, filename_mode='original', custom_filename=None):
+    def __init__(self, download_id, url, filename_mode='original', custom_filename=None, mirrors=None, split_sources=True):
         self.download_id = download_id
         self.url = url
+        # Primary URL first; extra mirrors are only used when they verify as the same file
+        self.sources = [url] + [m for m in (mirrors or []) if m and m != url]
+        self.split_sources = split_sources
         self.filename_mode = filename_mode
         self.custom_filename = custom_filename
         self.final_filename = None
         self.is_paused = False
         self.is_cancelled = False
         self.active_run_id = str(uuid.uuid4())
-        self.session = requests.Session()
+        # Own headers/cookies per job, but connections come from the shared process-wide pool
+        self.session = new_session()
         self.last_status = None
-        
-        adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=3)
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
 
     def determine_filename(self, response_headers=None):
         if self.final_filename: return self.final_filename
         self.final_filename = get_smart_filename(self.url, response_headers, self.custom_filename)
         return self.final_filename
 
-def download_with_smart_filename(controller, socketio_instance):
+# --- MIRRORS ---
+
+def segment_state_path(filepath):
+    return f"{filepath}.segments.json"
+
+def resolve_source(url, session):
+    """Turns a candidate URL into a source dict with its own headers and probe."""
+    gid = extract_gdrive_id(url)
+    if gid:
+        creds = get_credentials()
+        if not creds: return None
+        try: probe = get_drive_probe(gid)
+        except: probe = None
+        return {
+            'url': f"https://www.googleapis.com/drive/v3/files/{gid}?alt=media",
+            # Built per request, so a reconnect hours into the job carries a fresh token
+            'headers': drive_auth_headers,
+            'label': 'Google Drive',
+            'probe': probe
+        }
+    try: probe = get_direct_probe(url, http_client=session)
+    except: probe = None
+    url = probe['final_url'] if probe else url
+    return {'url': url, 'headers': {}, 'label': source_label(url), 'probe': probe}
+
+def prepare_mirrors(controller, filepath):
+    """Verifies and ranks the job's sources. Returns None when a plain single-source download is the better fit."""
+    with ThreadPoolExecutor(max_workers=len(controller.sources)) as pool:
+        sources = [s for s in pool.map(lambda u: resolve_source(u, controller.session), controller.sources) if s]
+    size, sources = verify_sources(sources)
+    if not size or not sources: return None
+
+    ranked = race_sources(controller.session, sources)
+    if not ranked: return None
+
+    state_path = segment_state_path(filepath)
+    segments = load_segment_state(state_path, size) if os.path.exists(filepath) else None
+    fresh = False
+    if segments is None:
+        # A file without a sidecar was written contiguously (single-source run), so resume from its size
+        start = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+        if start > size: start = 0
+        fresh = start == 0
+        segments = plan_segments(start, size, ranked, split=controller.split_sources)
+    return {'size': size, 'sources': ranked, 'segments': segments, 'state_path': state_path, 'fresh': fresh}
+
+def run_mirror_download(controller, plan, filename, filepath, current_run_id, socketio_instance):
+    """Downloads across the planned sources, emitting progress with the sources in use. Returns the total size."""
     download_id = controller.download_id
-    url = controller.url
-    current_run_id = controller.active_run_id
-    
-    try:
-        # --- 1. HANDLE GDRIVE LINKS AUTOMATICALLY ---
-        gid = extract_gdrive_id(url)
-        if gid:
-            creds = get_credentials()
-            if creds:
-                url = f"https://www.googleapis.com/drive/v3/files/{gid}?alt=media"
-                controller.session.headers.update({"Authorization": f"Bearer {creds.token}"})
-                if not controller.final_filename:
-                    meta = get_file_metadata(gid)
-                    controller.final_filename = meta.get('name')
+    total_size = plan['size']
+    stopped = lambda: controller.is_cancelled or controller.is_paused or controller.active_run_id != current_run_id
+
+    sink = FileSink(filepath, truncate=plan['fresh'], fsync=DOWNLOAD_FSYNC)
+    with sink:
+        if plan['fresh']: sink.preallocate(total_size)
+        job = MirrorDownload(controller.session, plan['sources'], sink, plan['segments'], buffer_pool,
+                             stopped, total_size, state_path=plan['state_path'])
+        job.save_state(force=True)
+        start_bytes = job.downloaded
+        start_time = time.time()
+        job.start()
+
+        while job.alive():
+            time.sleep(0.5)
+            if stopped(): continue
+            now = time.time()
+            speed = (job.downloaded - start_bytes) / max(now - start_time, 0.1)
+            rem_bytes = total_size - job.downloaded
+            status = {
+                "download_id": download_id,
+                "filename": filename,
+                "phase": "downloading",
+                "percentage": job.downloaded / total_size * 100,
+                "speed": format_speed(speed),
+                "eta": format_time(rem_bytes / speed if speed > 0 else 0),
+                "downloaded": job.downloaded,
+                "total_size": total_size,
+                "source": " + ".join(job.active_labels())
+            }
+            controller.last_status = status
+            if socketio_instance:
+                socketio_instance.emit("download_progress", status)
 
-        # --- 2. DETERMINE FILENAME ---
-        if not controller.final_filename:
-            try:
-                head = controller.session.head(url, timeout=10, allow_redirects=True)
-                controller.determine_filename(head.headers)
-            except: controller.determine_filename()
-        
-        filename = controller.final_filename
-        filepath = os.path.join(DOWNLOAD_DIR, filename)
+        if job.error: 
+            job.save_state(force=True)
+            raise job.error
+        if job.complete:
+            if os.path.exists(plan['state_path']): os.remove(plan['state_path'])
+        else:
+            job.save_state(force=True)
+    return total_size
 
-        if controller.is_cancelled: return
+def run_single_download(controller, probe, url, auth_headers, filename, filepath, current_run_id, socketio_instance):
+    """
+    Streams one source to disk. When the watchdog sees a stall or the connection
+    drops, it reconnects with a Range from the last written byte. auth_headers is
+    called per attempt. Returns the total size, or None if the run was paused or superseded.
+    """
+    download_id = controller.download_id
+    resume_byte_pos = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+    if os.path.exists(segment_state_path(filepath)):
+        # Left by a multi-source run: the file has holes, so a size-based resume would corrupt it
+        os.remove(segment_state_path(filepath))
+        resume_byte_pos = 0
+
+    # Skip the redirect chain when the probe already resolved it; signed redirect
+    # targets can expire, so fall back to the original URL if the origin refuses
+    get_url = probe['final_url'] if probe else url
+    watchdog = ThroughputWatchdog()
+    stopped = lambda: controller.is_paused or controller.active_run_id != current_run_id
+    downloaded = resume_byte_pos
+    total_size = 0
+    attempt = 0
+    reconnects = 0
 
-        # --- 3. DOWNLOAD PHASE ---
-        resume_byte_pos = os.path.getsize(filepath) if os.path.exists(filepath) else 0
-        headers = {}
+    while True:
+        headers = dict(auth_headers() if auth_headers else {})
         if resume_byte_pos > 0: headers["Range"] = f"bytes={resume_byte_pos}-"
-
-        with controller.session.get(url, headers=headers, stream=True, timeout=20) as response:
-            response.raise_for_status()
-            file_mode = "ab" if response.status_code == 206 else "wb"
-            if response.status_code != 206: resume_byte_pos = 0
-            
-            total_size = int(response.headers.get('content-length', 0)) + resume_byte_pos
-            downloaded = resume_byte_pos
-
-            with open(filepath, file_mode, buffering=1024*1024) as f:
-                start_time = time.time()
-                last_emit = 0
-                
-                for chunk in response.iter_content(chunk_size=1024*1024):
-                    if controller.is_cancelled: break
-                    if controller.is_paused or controller.active_run_id != current_run_id: return
-
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
+        attempt_start = downloaded
+        try:
+            response = controller.session.get(get_url, headers=headers, stream=True, timeout=watchdog.timeout)
+            if get_url != url and response.status_code in (401, 403, 404, 410):
+                response.close()
+                probe_cache.invalidate(url)
+                get_url = url
+                response = controller.session.get(url, headers=headers, stream=True, timeout=watchdog.timeout)
+
+            with response:
+                if is_retryable_status(response.status_code):
+                    raise TransientError(f"HTTP {response.status_code}")
+                response.raise_for_status()
+                if response.status_code != 206: resume_byte_pos = 0
+
+                total_size = int(response.headers.get('content-length', 0)) + resume_byte_pos
+                downloaded = resume_byte_pos
+                watchdog.reset()
+
+                sink = FileSink(filepath, offset=resume_byte_pos, truncate=resume_byte_pos == 0, fsync=DOWNLOAD_FSYNC)
+                with sink, buffer_pool.buffer() as buf:
+                    if total_size: sink.preallocate(total_size)
+                    start_time = time.time()
+                    last_emit = 0
+
+                    for view in read_chunks(raw_reader(response), buf, watchdog.read_size):
+                        if controller.is_cancelled: return total_size
+                        if stopped(): return None
+
+                        sink.write(view)
+                        downloaded += len(view)
+                        watchdog.feed(len(view))
+                        watchdog.check()
                         now = time.time()
-                        
+
                         if now - last_emit >= 0.5:
                             speed = (downloaded - resume_byte_pos) / max(now - start_time, 0.1)
                             pct = (downloaded / total_size * 100) if total_size else 0
-                            
+
                             rem_bytes = total_size - downloaded
                             eta = format_time(rem_bytes / speed if speed > 0 else 0)
-                            
+
                             status = {
                                 "download_id": download_id,
                                 "filename": filename,
@@ -723,20 +1069,117 @@ def download_with_smart_filename(controller, socketio_instance):
                                 "speed": format_speed(speed),
                                 "eta": eta,
                                 "downloaded": downloaded,
-                                "total_size": total_size
+                                "total_size": total_size,
+                                "retries": reconnects
                             }
                             controller.last_status = status
                             if socketio_instance:
                                 socketio_instance.emit("download_progress", status)
                             last_emit = now
 
+            if total_size and downloaded < total_size:
+                raise TransientError("Connection closed early")
+            return total_size
+
+        except RETRYABLE_ERRORS as e:
+            if controller.is_cancelled: return total_size
+            if stopped(): return None
+            # Slow but moving is still worth finishing; only attempts that got nothing spend the budget
+            if downloaded > attempt_start: attempt = 0
+            attempt += 1
+            if attempt > MAX_RECONNECTS: raise
+            reconnects += 1
+            resume_byte_pos = downloaded
+            delay = backoff_delay(attempt)
+            print(f"Download Retry ({attempt}/{MAX_RECONNECTS}) {filename}: {e}")
+
+            status = {
+                "download_id": download_id,
+                "filename": filename,
+                "phase": "downloading",
+                "percentage": (downloaded / total_size * 100) if total_size else 0,
+                "speed": f"Reconnecting ({attempt}/{MAX_RECONNECTS})...",
+                "eta": format_time(delay),
+                "downloaded": downloaded,
+                "total_size": total_size,
+                "retries": reconnects,
+                "reconnecting": True,
+                "retry": attempt,
+                "max_retries": MAX_RECONNECTS,
+                "reason": str(e)
+            }
+            controller.last_status = status
+            if socketio_instance:
+                socketio_instance.emit("download_progress", status)
+
+            wake = time.time() + delay
+            while time.time() < wake:
+                if controller.is_cancelled: return total_size
+                if stopped(): return None
+                time.sleep(0.25)
+
+def download_with_smart_filename(controller, socketio_instance):
+    download_id = controller.download_id
+    url = controller.url
+    current_run_id = controller.active_run_id
+    
+    try:
+        # --- 1. HANDLE GDRIVE LINKS AUTOMATICALLY ---
+        probe = None
+        via_drive_api = False
+        auth_headers = None
+        gid = extract_gdrive_id(url)
+        if gid:
+            creds = get_credentials()
+            if creds:
+                via_drive_api = True
+                url = f"https://www.googleapis.com/drive/v3/files/{gid}?alt=media"
+                # Per-request, not on the session, so the token never reaches mirror hosts
+                auth_headers = drive_auth_headers
+                if not controller.final_filename:
+                    try: controller.final_filename = get_drive_probe(gid)['filename']
+                    except: pass
+
+        # --- 2. DETERMINE FILENAME ---
+        # Reuses the probe /detect_filename already made for this URL when it is still fresh
+        if not via_drive_api:
+            try: probe = get_direct_probe(url, http_client=controller.session)
+            except: probe = None
+
+        if not controller.final_filename:
+            custom = (controller.custom_filename or '').strip()
+            if probe and probe.get('filename') and not custom:
+                controller.final_filename = probe['filename']
+            else:
+                controller.determine_filename(probe['headers'] if probe else None)
+        
+        filename = controller.final_filename
+        filepath = os.path.join(DOWNLOAD_DIR, filename)
+
+        if controller.is_cancelled: return
+
+        # --- 3. DOWNLOAD PHASE ---
+        if os.path.exists(upload_state_path(filepath)) and not os.path.exists(segment_state_path(filepath)):
+            # Finished downloading before a restart and was mid-upload: only the upload is left to resume
+            total_size = os.path.getsize(filepath)
+        else:
+            mirror_plan = prepare_mirrors(controller, filepath) if len(controller.sources) > 1 else None
+            if mirror_plan:
+                total_size = run_mirror_download(controller, mirror_plan, filename, filepath, current_run_id, socketio_instance)
+            else:
+                total_size = run_single_download(controller, probe, url, auth_headers, filename, filepath, current_run_id, socketio_instance)
+                if total_size is None: return
+
         if controller.is_cancelled:
-            if os.path.exists(filepath): os.remove(filepath)
-            active_downloads.pop(download_id, None)
+            for p in (filepath, segment_state_path(filepath), upload_state_path(filepath)):
+                if os.path.exists(p): os.remove(p)
+            finish_job(download_id)
             return
 
         # --- 4. UPLOAD PHASE ---
         if not controller.is_paused and controller.active_run_id == current_run_id:
+            # Renders alongside the upload; both only read the finished file
+            previews = preview_cache.submit(filepath)
             if socketio_instance:
                 socketio_instance.emit("download_progress", {
                     "download_id": download_id,
@@ -789,14 +1232,15 @@ def download_with_smart_filename(controller, socketio_instance):
                         'gdrive_link': drive_file.get('webViewLink'),
                         'storage': 'drive'
                     })
-                    if os.path.exists(filepath): os.remove(filepath)
                     if socketio_instance:
                         socketio_instance.emit("download_complete", {"download_id": download_id, "filename": filename})
+                    release_local_file(filepath, previews, drive_file.get('id'))
                 else:
                     raise Exception("Upload failed, no file object returned.")
-                active_downloads.pop(download_id, None)
+                finish_job(download_id)
 
             except Exception as e:
+                preview_cache.discard(previews)
                 if socketio_instance:
                     socketio_instance.emit("download_error", {"download_id": download_id, "error": f"Upload Error: {str(e)}"})
 
@@ -816,18 +1260,106 @@ def background_system_stats(socketio):
         except Exception: 
             time.sleep(5)
 
+def start_library_sync(socketio):
+    global library_sync
+    library_sync = DriveLibrarySync(
+        download_history,
+        # Never connected: skip the cycle without get_credentials() logging every interval
+        lambda: get_gdrive_service() if os.path.exists(TOKEN_PATH) else None,
+        state_path=LIBRARY_STATE_PATH,
+        interval=DRIVE_SYNC_INTERVAL,
+        on_update=lambda payload: socketio.emit('library_updated', payload),
+        should_run=lambda: shared_state.acquire_lease('drive_sync', WORKER_ID, DRIVE_SYNC_INTERVAL * 3)
+    )
+    threading.Thread(target=library_sync.run, daemon=True).start()
+
+# --- JOB CONTROL ---
+# Pause/resume/cancel act on this worker's jobs; for a job owned by another
+# worker the request is forwarded through the shared state backend.
+
+def finish_job(download_id):
+    active_downloads.pop(download_id, None)
+    shared_state.release_job(download_id)
+
+def pause_job(did):
+    c = active_downloads.get(did)
+    if not c: return False
+    c.is_paused = True
+    c.active_run_id = str(uuid.uuid4())
+    if socketio_instance: socketio_instance.emit('download_paused', {'download_id': did})
+    return True
+
+def resume_job(did):
+    c = active_downloads.get(did)
+    if not c: return False
+    c.is_paused = False
+    c.active_run_id = str(uuid.uuid4())
+    threading.Thread(target=download_with_smart_filename, args=(c, socketio_instance)).start()
+    return True
+
+def cancel_job(did):
+    c = active_downloads.get(did)
+    if not c: return False
+    c.is_cancelled = True
+    # Don't pop immediately, let the thread handle cleanup
+    if c.is_paused:
+        finish_job(did)
+        if c.final_filename:
+            try: 
+                p = os.path.join(DOWNLOAD_DIR, c.final_filename)
+                for path in (p, segment_state_path(p), upload_state_path(p)):
+                    if os.path.exists(path): os.remove(path)
+            except: pass
+    return True
+
+JOB_ACTIONS = {'pause': pause_job, 'resume': resume_job, 'cancel': cancel_job}
+
+def background_job_sync():
+    """Publishes this worker's job state and applies control messages addressed to it."""
+    last_publish = last_heartbeat = 0
+    while True:
+        try:
+            now = time.time()
+            if now - last_heartbeat >= 5:
+                shared_state.heartbeat(WORKER_ID)
+                last_heartbeat = now
+            for did, action in shared_state.take_controls(WORKER_ID):
+                JOB_ACTIONS.get(action, lambda _: False)(did)
+            if now - last_publish >= 1:
+                for did, c in list(active_downloads.items()):
+                    shared_state.update_job(did, c.last_status, c.is_paused)
+                last_publish = now
+            time.sleep(0.25)
+        except Exception as e:
+            print(f"Job Sync Error: {e}")
+            time.sleep(2)
+
 def register_socket_events(socketio):
     global socketio_instance
     socketio_instance = socketio
-    threading.Thread(target=background_system_stats, args=(socketio,), daemon=True).start()
+    start_library_sync(socketio)
+    if shared_state.shared:
+        shared_state.heartbeat(WORKER_ID)
+        threading.Thread(target=background_job_sync, daemon=True).start()
+
+    stats_started = threading.Event()
 
     @socketio.on('connect')
     def handle_connect():
+        # RAM stats (and psutil) only once someone is watching
+        if not stats_started.is_set():
+            stats_started.set()
+            threading.Thread(target=background_system_stats, args=(socketio,), daemon=True).start()
         if active_downloads:
             for did, c in active_downloads.items():
                 if not c.is_cancelled:
                     if c.last_status: emit('download_progress', c.last_status)
                     elif c.is_paused: emit('download_paused', {'download_id': did})
+        # Jobs running on other workers, as last published by their owner
+        for job in shared_state.jobs():
+            if job['owner'] == WORKER_ID: continue
+            if job['status']: emit('download_progress', job['status'])
+            elif job['paused']: emit('download_paused', {'download_id': job['job_id']})
 
     @socketio.on('start_download')
     def handle_start(data):
@@ -837,9 +1369,12 @@ def register_socket_events(socketio):
             did, 
             data['url'], 
             data.get('filename_mode'), 
-            data.get('custom_filename')
+            data.get('custom_filename'),
+            mirrors=data.get('mirrors'),
+            split_sources=data.get('split_sources', True)
         )
         active_downloads[did] = c
+        shared_state.claim_job(did, WORKER_ID)
         
         emit('download_progress', {
             'download_id': did, 'filename': 'Starting...', 'phase': 'downloading', 'percentage': 0,
@@ -850,30 +1385,15 @@ def register_socket_events(socketio):
 
     @socketio.on('pause_download')
     def handle_pause(data):
-        if data['download_id'] in active_downloads:
-            active_downloads[data['download_id']].is_paused = True
-            active_downloads[data['download_id']].active_run_id = str(uuid.uuid4())
-            emit('download_paused', {'download_id': data['download_id']})
+        did = data['download_id']
+        if not pause_job(did): shared_state.send_control(did, 'pause')
 
     @socketio.on('resume_download')
     def handle_resume(data):
-        if data['download_id'] in active_downloads:
-            c = active_downloads[data['download_id']]
-            c.is_paused = False
-            c.active_run_id = str(uuid.uuid4())
-            threading.Thread(target=download_with_smart_filename, args=(c, socketio)).start()
+        did = data['download_id']
+        if not resume_job(did): shared_state.send_control(did, 'resume')
 
     @socketio.on('cancel_download')
     def handle_cancel(data):
         did = data['download_id']
-        if did in active_downloads:
-            c = active_downloads[did]
-            c.is_cancelled = True
-            # Don't pop immediately, let the thread handle cleanup
-            if c.is_paused:
-                active_downloads.pop(did, None)
-                if c.final_filename:
-                    try: 
-                        p = os.path.join(DOWNLOAD_DIR, c.final_filename)
-                        if os.path.exists(p): os.remove(p)
-                    except: pass
+        if not cancel_job(did): shared_state.send_control(did, 'cancel')
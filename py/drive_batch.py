@@ -0,0 +1,125 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- DRIVE BATCH REQUESTS ---
+# Groups many small Drive mutations into batch HTTP requests (one round trip per
+# BATCH_LIMIT calls), runs batches with bounded concurrency and retries only the
+# items that failed with a transient error.
+
+BATCH_LIMIT = 100
+MAX_WORKERS = 4
+MAX_ATTEMPTS = 4
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+
+def error_status(exc):
+    return getattr(getattr(exc, 'resp', None), 'status', None)
+
+
+def is_retryable(exc):
+    status = error_status(exc)
+    if status in RETRYABLE_STATUSES: return True
+    if status == 403: return any(r in str(exc) for r in RATE_LIMIT_REASONS)
+    # No HTTP status at all means the transport failed (timeout, reset)
+    return status is None
+
+
+def _run_batch(service_factory, chunk, build_request, ok_statuses, batch_uri=None):
+    """Executes one batch. Returns a list of (key, result, retryable)."""
+    outcomes = []
+    try:
+        # googleapiclient services are not thread-safe, so each worker builds its own
+        service = service_factory()
+        if not service:
+            return [(key, {'success': False, 'error': 'Drive not connected'}, False) for key, _ in chunk]
+
+        def callback(request_id, response, exception):
+            key = chunk[int(request_id)][0]
+            if exception is None or error_status(exception) in ok_statuses:
+                outcomes.append((key, {'success': True, 'response': response}, False))
+            else:
+                outcomes.append((key, {'success': False, 'error': str(exception)}, is_retryable(exception)))
+
+        if batch_uri:
+            # The service's own batch URI comes from the discovery document and ignores api_endpoint overrides
+            from googleapiclient.http import BatchHttpRequest
+            batch = BatchHttpRequest(callback=callback, batch_uri=batch_uri)
+        else:
+            batch = service.new_batch_http_request(callback=callback)
+        for i, (key, payload) in enumerate(chunk):
+            batch.add(build_request(service, key, payload), request_id=str(i))
+        batch.execute()
+    except Exception as e:
+        done = {key for key, _, _ in outcomes}
+        outcomes.extend((key, {'success': False, 'error': str(e)}, is_retryable(e)) for key, _ in chunk if key not in done)
+    return outcomes
+
+
+def execute_batched(service_factory, items, build_request, ok_statuses=(), max_workers=MAX_WORKERS,
+                    batch_size=BATCH_LIMIT, max_attempts=MAX_ATTEMPTS, batch_uri=None):
+    """
+    Runs build_request(service, key, payload) for every (key, payload) in items
+    through Drive batch requests. Returns {key: {'success': bool, 'response'|'error': ...}}.
+    batch_uri overrides where batches are sent (e.g. a local fake API).
+    """
+    pending = list({key: (key, payload) for key, payload in items}.values())
+    results = {}
+    attempt = 0
+    while pending:
+        if attempt:
+            time.sleep(min(2 ** attempt, 16) + random.uniform(0, 1))
+        chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        retry = []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            for outcomes in pool.map(lambda c: _run_batch(service_factory, c, build_request, ok_statuses, batch_uri), chunks):
+                for key, result, retryable in outcomes:
+                    results[key] = result
+                    if retryable: retry.append(key)
+        attempt += 1
+        if attempt >= max_attempts: break
+        payloads = dict(pending)
+        pending = [(key, payloads[key]) for key in retry]
+    return results
+
+
+class PermissionBatcher:
+    """Collects 'anyone can read' grants for a short window and sends them as one batch."""
+
+    def __init__(self, service_factory, window=0.5, batch_uri=None):
+        self.service_factory = service_factory
+        self.batch_uri = batch_uri
+        self.window = window
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def submit(self, file_id):
+        with self._lock:
+            self._pending.append((file_id, None))
+            if len(self._pending) >= BATCH_LIMIT:
+                if self._timer: self._timer.cancel()
+                self._timer = None
+                threading.Thread(target=self.flush, daemon=True).start()
+            elif not self._timer:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            items, self._pending = self._pending, []
+            self._timer = None
+        if not items: return {}
+        results = execute_batched(
+            self.service_factory, items,
+            lambda service, fid, _: service.permissions().create(
+                fileId=fid, body={'type': 'anyone', 'role': 'reader'}, fields='id'
+            ),
+            batch_uri=self.batch_uri
+        )
+        for fid, res in results.items():
+            if not res['success']: print(f"GDrive Permission Error ({fid}): {res['error']}")
+        return results
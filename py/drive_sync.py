@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# --- DRIVE LIBRARY SYNC ---
+# One paginated files.list scan seeds the library, after which only changes.list
+# deltas are applied. The start page token and library snapshot are persisted so
+# a restart resumes polling instead of relisting the whole Drive.
+
+FILE_FIELDS = "id, name, size, mimeType, createdTime, modifiedTime, webViewLink, trashed, ownedByMe"
+LIST_QUERY = "trashed = false and 'me' in owners and not mimeType contains 'application/vnd.google-apps.'"
+PAGE_SIZE = 1000
+
+
+def drive_file_to_entry(f):
+    """Maps a Drive file resource onto the library entry shape used by /list_files."""
+    created = f.get('createdTime') or f.get('modifiedTime') or ''
+    try:
+        date = datetime.strptime(created[:16], '%Y-%m-%dT%H:%M').strftime('%Y-%m-%d %H:%M')
+    except ValueError:
+        date = datetime.now().strftime('%Y-%m-%d %H:%M')
+    return {
+        'name': f.get('name'),
+        'size': int(f.get('size') or 0),
+        'date': date,
+        'gdrive_id': f.get('id'),
+        'gdrive_link': f.get('webViewLink'),
+        'storage': 'drive'
+    }
+
+
+def is_library_file(f):
+    """Only non-trashed, binary files we own belong in the library (no folders or Google Docs)."""
+    if not f or f.get('trashed'): return False
+    if f.get('ownedByMe') is False: return False
+    return not (f.get('mimeType') or '').startswith('application/vnd.google-apps.')
+
+
+class DriveLibrarySync:
+    """Keeps a LibraryStore current with Drive using a stored changes.list start page token."""
+
+    def __init__(self, store, service_factory, state_path=None, interval=20, on_update=None, should_run=None):
+        self.store = store
+        self.service_factory = service_factory
+        self.state_path = state_path
+        self.interval = interval
+        self.on_update = on_update
+        # With several workers only the lease holder polls Drive; the others just serve the shared store
+        self.should_run = should_run
+        self.leading = False
+        self.page_token = None
+        self.last_sync = None
+        self.api_calls = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    # --- STATE ---
+
+    def load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path): return False
+        try:
+            with open(self.state_path, 'r') as fh:
+                state = json.load(fh)
+            if not state.get('page_token'): return False
+            self.store.replace_all(state.get('files', []))
+            self.page_token = state['page_token']
+            return True
+        except Exception as e:
+            print(f"Sync State Error: {e}")
+            return False
+
+    def save_state(self):
+        if not self.state_path: return
+        tmp = f"{self.state_path}.tmp"
+        try:
+            with open(tmp, 'w') as fh:
+                json.dump({'page_token': self.page_token, 'files': self.store.snapshot()}, fh)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            print(f"Sync State Error: {e}")
+
+    # --- SYNC ---
+
+    def full_scan(self, service):
+        """Relists the whole library. The token is taken first so changes made mid-scan are replayed."""
+        token = service.changes().getStartPageToken().execute().get('startPageToken')
+        self.api_calls += 1
+        entries, page = [], None
+        while True:
+            resp = service.files().list(
+                q=LIST_QUERY,
+                spaces='drive',
+                orderBy='createdTime',
+                pageSize=PAGE_SIZE,
+                pageToken=page,
+                fields=f"nextPageToken, files({FILE_FIELDS})"
+            ).execute()
+            self.api_calls += 1
+            entries.extend(drive_file_to_entry(f) for f in resp.get('files', []) if is_library_file(f))
+            page = resp.get('nextPageToken')
+            if not page: break
+
+        self.store.replace_all(entries)
+        self.page_token = token
+        self.save_state()
+        self._notify({'full': True, 'count': len(entries)})
+
+    def poll_changes(self, service):
+        """Applies every change since the stored token. Returns (upserted, removed) entry lists."""
+        upserted, removed = [], []
+        page = self.page_token
+        while page:
+            resp = service.changes().list(
+                pageToken=page,
+                spaces='drive',
+                pageSize=PAGE_SIZE,
+                includeRemoved=True,
+                restrictToMyDrive=True,
+                fields=f"nextPageToken, newStartPageToken, changes(removed, fileId, file({FILE_FIELDS}))"
+            ).execute()
+            self.api_calls += 1
+
+            for change in resp.get('changes', []):
+                file_id = change.get('fileId')
+                f = change.get('file')
+                if change.get('removed') or not is_library_file(f):
+                    if self.store.remove(file_id): removed.append(file_id)
+                    continue
+                entry = drive_file_to_entry(f)
+                if self.store.upsert(entry): upserted.append(entry)
+
+            if resp.get('newStartPageToken'):
+                self.page_token = resp['newStartPageToken']
+                break
+            page = resp.get('nextPageToken')
+            self.page_token = page
+
+        if upserted or removed:
+            self.save_state()
+            self._notify({'full': False, 'upserted': upserted, 'removed': removed})
+        return upserted, removed
+
+    def sync_once(self):
+        """Runs one cycle: a full scan if we have no token, otherwise a changes poll."""
+        with self._lock:
+            service = self.service_factory()
+            if not service: return False
+            try:
+                if not self.page_token:
+                    self.full_scan(service)
+                else:
+                    self.poll_changes(service)
+            except Exception as e:
+                # An expired/invalid token means the delta chain is broken; relist next cycle
+                if getattr(getattr(e, 'resp', None), 'status', None) in (400, 404, 410):
+                    self.page_token = None
+                raise
+            self.last_sync = time.time()
+            return True
+
+    def lead(self):
+        """True while this worker holds the sync lease. Only the leader may talk to Drive."""
+        if self.should_run and not self.should_run():
+            self.leading = False
+            return False
+        with self._lock:
+            # (Re)load on taking over, since the previous leader may have moved the token on
+            if not self.leading: self.load_state()
+            self.leading = True
+        return True
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                if self.lead(): self.sync_once()
+            except Exception as e:
+                print(f"Drive Sync Error: {e}")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def _notify(self, payload):
+        if not self.on_update: return
+        try:
+            self.on_update(payload)
+        except Exception as e:
+            print(f"Sync Notify Error: {e}")
@@ -0,0 +1,219 @@
+import json
+import os
+import re
+import time
+from urllib.parse import urlsplit
+
+from py.watchdog import RETRYABLE_ERRORS, TransientError, backoff_delay, is_retryable_status
+
+# --- RESUMABLE DRIVE UPLOADS ---
+# Speaks Drive's resumable upload protocol directly: one POST opens a session, then
+# chunks are PUT with Content-Range until Drive answers 200/201. The session URI and
+# the committed offset go to a sidecar next to the file, so a network error (or a
+# restart) asks Drive how much it already has and carries on from there instead of
+# re-sending the whole file.
+
+DEFAULT_ENDPOINT = 'https://www.googleapis.com/'
+UPLOAD_FIELDS = 'id, webViewLink, webContentLink'
+CHUNK_SIZE = 8 * 1024 * 1024  # Drive requires multiples of 256 KiB
+MAX_RETRIES = 8
+SESSION_TTL = 6 * 24 * 3600  # Drive keeps sessions for about a week
+CHUNK_TIMEOUT = (10, 120)
+
+
+class UploadError(IOError):
+    """Drive rejected the upload in a way retrying will not fix."""
+
+
+class UploadProgress:
+    """Same surface as googleapiclient's MediaUploadProgress, so existing callbacks keep working."""
+
+    def __init__(self, resumable_progress, total_size):
+        self.resumable_progress = resumable_progress
+        self.total_size = total_size
+
+    def progress(self):
+        return self.resumable_progress / self.total_size if self.total_size else 1.0
+
+
+def api_root(endpoint=None):
+    """
+    Scheme and host of a DRIVE_API_ENDPOINT value. That value is the full API base
+    googleapiclient uses (e.g. http://127.0.0.1:9999/drive/v3/), while uploads and
+    batches live under /upload/... and /batch/... on the same host.
+    """
+    if not endpoint: return DEFAULT_ENDPOINT
+    parts = urlsplit(endpoint)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+def upload_state_path(filepath):
+    return f"{filepath}.upload.json"
+
+
+def _committed(response):
+    """Offset after the last byte Drive has stored, from a 308's Range header (none means nothing yet)."""
+    m = re.match(r'bytes=0-(\d+)', response.headers.get('Range', ''))
+    return int(m.group(1)) + 1 if m else 0
+
+
+class ResumableUpload:
+    """Uploads one local file, resuming a persisted session when it still matches the file."""
+
+    def __init__(self, http, filepath, name, mimetype, auth_headers, endpoint=None, chunk_size=CHUNK_SIZE,
+                 max_retries=MAX_RETRIES, state_path=None, fields=UPLOAD_FIELDS):
+        self.http = http
+        self.filepath = filepath
+        self.name = name
+        self.mimetype = mimetype or 'application/octet-stream'
+        # Called per request so a token refreshed mid-upload is picked up
+        self.auth_headers = auth_headers
+        self.root = api_root(endpoint)
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.state_path = state_path if state_path is not None else upload_state_path(filepath)
+        self.fields = fields
+        self.size = os.path.getsize(filepath)
+        self.mtime = int(os.path.getmtime(filepath))
+        self.session_uri = None
+        self.created = None
+        self.offset = 0
+        self.retries = 0
+
+    # --- STATE ---
+
+    def load_state(self):
+        """Restores a saved session if it belongs to this exact file and has not expired."""
+        try:
+            with open(self.state_path, 'r') as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if (state.get('size') != self.size or state.get('mtime') != self.mtime or state.get('name') != self.name
+                or time.time() - state.get('created', 0) > SESSION_TTL or not state.get('session_uri')):
+            self.clear_state()
+            return False
+        self.session_uri = state['session_uri']
+        self.offset = state.get('offset', 0)
+        self.created = state['created']
+        return True
+
+    def save_state(self):
+        if not self.state_path: return
+        tmp = f"{self.state_path}.tmp"
+        try:
+            with open(tmp, 'w') as fh:
+                json.dump({'session_uri': self.session_uri, 'offset': self.offset, 'size': self.size,
+                           'mtime': self.mtime, 'name': self.name, 'created': self.created}, fh)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            print(f"Upload State Error: {e}")
+
+    def clear_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            try: os.remove(self.state_path)
+            except OSError: pass
+
+    # --- PROTOCOL ---
+
+    def _headers(self, extra):
+        return dict(self.auth_headers() or {}, **extra)
+
+    def start_session(self):
+        resp = self.http.post(
+            f"{self.root}upload/drive/v3/files",
+            params={'uploadType': 'resumable', 'fields': self.fields},
+            json={'name': self.name, 'mimeType': self.mimetype},
+            headers=self._headers({'X-Upload-Content-Type': self.mimetype, 'X-Upload-Content-Length': str(self.size)}),
+            timeout=CHUNK_TIMEOUT
+        )
+        self._check(resp)
+        if resp.status_code != 200 or not resp.headers.get('Location'):
+            raise UploadError(f"Could not start upload session (HTTP {resp.status_code})")
+        self.session_uri = resp.headers['Location']
+        self.offset = 0
+        self.created = time.time()
+        self.save_state()
+
+    def query_offset(self):
+        """Asks Drive what it has committed. Returns the file resource if the upload already completed."""
+        resp = self.http.put(self.session_uri, headers=self._headers({'Content-Range': f"bytes */{self.size}", 'Content-Length': '0'}),
+                             timeout=CHUNK_TIMEOUT)
+        return self._handle(resp)
+
+    def send_chunk(self, fd):
+        end = min(self.offset + self.chunk_size, self.size)
+        data = os.pread(fd, end - self.offset, self.offset) if hasattr(os, 'pread') else self._read_at(fd, end)
+        content_range = f"bytes {self.offset}-{end - 1}/{self.size}" if end > self.offset else f"bytes */{self.size}"
+        resp = self.http.put(self.session_uri, data=data, headers=self._headers({'Content-Range': content_range}),
+                             timeout=CHUNK_TIMEOUT)
+        return self._handle(resp)
+
+    def _read_at(self, fd, end):
+        os.lseek(fd, self.offset, os.SEEK_SET)
+        return os.read(fd, end - self.offset)
+
+    def _check(self, resp):
+        if is_retryable_status(resp.status_code) or resp.status_code == 401:
+            # 401 is usually an access token that expired mid-upload; the next request carries a fresh one
+            raise TransientError(f"HTTP {resp.status_code}")
+        if resp.status_code >= 400 and resp.status_code not in (404, 410):
+            raise UploadError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+
+    def _handle(self, resp):
+        """Applies a session response: returns the file resource when done, otherwise None."""
+        self._check(resp)
+        if resp.status_code in (200, 201):
+            return resp.json()
+        if resp.status_code in (404, 410):
+            # The session expired or was discarded; only a new one can continue
+            self.session_uri = None
+            self.offset = 0
+            self.clear_state()
+            raise TransientError("Upload session expired")
+        if resp.status_code == 308:
+            self.offset = _committed(resp)
+            self.save_state()
+            return None
+        raise UploadError(f"Unexpected upload response (HTTP {resp.status_code})")
+
+    # --- DRIVER ---
+
+    def upload(self, progress_callback=None):
+        """Runs the upload to completion and returns Drive's file resource."""
+        resuming = self.load_state()
+        fd = os.open(self.filepath, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            attempt = 0
+            # A restored session starts by asking Drive where it got to
+            needs_query = resuming
+            while True:
+                try:
+                    if not self.session_uri:
+                        self.start_session()
+                        needs_query = False
+                    if needs_query:
+                        result = self.query_offset()
+                        needs_query = False
+                    else:
+                        before = self.offset
+                        result = self.send_chunk(fd)
+                        if self.offset > before: attempt = 0
+                    if result is not None:
+                        self.clear_state()
+                        return result
+                    if progress_callback and self.session_uri:
+                        progress_callback(UploadProgress(self.offset, self.size))
+                except RETRYABLE_ERRORS as e:
+                    attempt += 1
+                    self.retries += 1
+                    if attempt > self.max_retries: raise
+                    delay = backoff_delay(attempt)
+                    print(f"Upload Retry ({attempt}/{self.max_retries}) {self.name}: {e}")
+                    time.sleep(delay)
+                    # Drive may have committed part (or none) of the chunk that failed
+                    needs_query = bool(self.session_uri)
+        finally:
+            os.close(fd)
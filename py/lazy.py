@@ -0,0 +1,48 @@
+import importlib
+import importlib.util
+import sys
+import threading
+
+# --- LAZY IMPORTS ---
+# yt-dlp, the Google API client, OpenCV and psutil together add seconds of import
+# time and tens of MB of RSS to every worker. They are only needed once a request
+# actually uses them, so each sits behind a LazyModule that imports on first
+# attribute access. Availability is answered from the import system's finder
+# without executing the module.
+
+
+class LazyModule:
+    """Stands in for a module and imports it the first time an attribute is read."""
+
+    def __init__(self, name):
+        self.module_name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self.module_name)
+        return self._module
+
+    def __getattr__(self, attr):
+        # Dunder lookups (copy, pickle, repr machinery) must not trigger the import
+        if attr.startswith('__') or attr in ('_module', '_lock', 'module_name'): raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+    @property
+    def available(self):
+        """True if the top-level package is installed; nothing is imported to find out."""
+        if self._module is not None or self.module_name in sys.modules: return True
+        try:
+            return importlib.util.find_spec(self.module_name.partition('.')[0]) is not None
+        except (ImportError, ValueError):
+            return False
+
+    @property
+    def loaded(self):
+        return self._module is not None or self.module_name in sys.modules
+
+    def __repr__(self):
+        return f"<LazyModule {self.module_name} ({'loaded' if self.loaded else 'deferred'})>"
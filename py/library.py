@@ -0,0 +1,152 @@
+import json
+import threading
+
+
+def entry_key(entry):
+    """Library entries are keyed by Drive ID, falling back to the filename for local-only files."""
+    return entry.get('gdrive_id') or f"local:{entry.get('name')}"
+
+
+class LibraryStore:
+    """Thread-safe, insertion-ordered store of library entries (oldest first)."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def snapshot(self):
+        with self._lock:
+            return [dict(e) for e in self._entries.values()]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def find_by_name(self, name):
+        with self._lock:
+            return next((dict(e) for e in self._entries.values() if e.get('name') == name), None)
+
+    def append(self, entry):
+        self.upsert(entry)
+
+    def upsert(self, entry):
+        """Inserts or updates an entry in place. Returns True if anything changed."""
+        key = entry_key(entry)
+        with self._lock:
+            current = self._entries.get(key)
+            if current is None:
+                self._entries[key] = dict(entry)
+                return True
+            merged = {**current, **{k: v for k, v in entry.items() if v is not None}}
+            if merged == current: return False
+            self._entries[key] = merged
+            return True
+
+    def remove(self, key):
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def remove_by_name(self, name):
+        """Removes every entry with this filename and returns them."""
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if e.get('name') == name]
+            return [self._entries.pop(k) for k in keys]
+
+    def replace_all(self, entries, keep_local=True):
+        """Swaps in a full listing. Local-only entries (no gdrive_id) survive unless keep_local is False."""
+        with self._lock:
+            fresh = {entry_key(e): dict(e) for e in entries}
+            if keep_local:
+                for k, e in self._entries.items():
+                    if not e.get('gdrive_id') and k not in fresh:
+                        fresh[k] = e
+            self._entries = fresh
+
+
+class SQLiteLibraryStore(LibraryStore):
+    """Same interface backed by a shared database file, so every worker serves one library."""
+
+    def __init__(self, path):
+        # Imported lazily: shared_state pulls in python-socketio, which the in-memory store doesn't need
+        from py.shared_state import connect_sqlite
+        self._lock = threading.RLock()
+        self.conn = connect_sqlite(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS library (seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE, entry TEXT)")
+
+    def _rows(self, sql, args=()):
+        with self._lock:
+            return [json.loads(r[0]) for r in self.conn.execute(sql, args).fetchall()]
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM library").fetchone()[0]
+
+    def snapshot(self):
+        return self._rows("SELECT entry FROM library ORDER BY seq")
+
+    def get(self, key):
+        rows = self._rows("SELECT entry FROM library WHERE key = ?", (key,))
+        return rows[0] if rows else None
+
+    def find_by_name(self, name):
+        return next((e for e in self.snapshot() if e.get('name') == name), None)
+
+    def upsert(self, entry):
+        key = entry_key(entry)
+        with self._lock:
+            # Read and write in one write transaction; another worker may be upserting the same key
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT entry FROM library WHERE key = ?", (key,)).fetchone()
+                changed = True
+                if row is None:
+                    self.conn.execute("INSERT INTO library (key, entry) VALUES (?, ?)", (key, json.dumps(entry)))
+                else:
+                    current = json.loads(row[0])
+                    merged = {**current, **{k: v for k, v in entry.items() if v is not None}}
+                    changed = merged != current
+                    if changed:
+                        self.conn.execute("UPDATE library SET entry = ? WHERE key = ?", (json.dumps(merged), key))
+                self.conn.execute("COMMIT")
+                return changed
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def remove(self, key):
+        with self._lock:
+            entry = self.get(key)
+            if entry: self.conn.execute("DELETE FROM library WHERE key = ?", (key,))
+            return entry
+
+    def remove_by_name(self, name):
+        with self._lock:
+            removed = [e for e in self.snapshot() if e.get('name') == name]
+            for e in removed: self.conn.execute("DELETE FROM library WHERE key = ?", (entry_key(e),))
+            return removed
+
+    def replace_all(self, entries, keep_local=True):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if keep_local:
+                    fresh_keys = {entry_key(e) for e in entries}
+                    stale = [k for (k,) in self.conn.execute("SELECT key FROM library WHERE key NOT LIKE 'local:%'")]
+                    self.conn.executemany("DELETE FROM library WHERE key = ?", [(k,) for k in stale if k not in fresh_keys])
+                else:
+                    self.conn.execute("DELETE FROM library")
+                for e in entries:
+                    self.conn.execute("INSERT INTO library (key, entry) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET entry = excluded.entry",
+                                      (entry_key(e), json.dumps(e)))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
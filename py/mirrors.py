@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from py.watchdog import ThroughputWatchdog
+from py.writer import raw_reader, read_chunks
+
+# --- MULTI-SOURCE DOWNLOADS ---
+# A job can list several URLs for the same file. Sources are verified against each
+# other, raced on a small range to rank them, and the byte range is split across
+# them in proportion to that speed. A worker whose source errors or stalls picks
+# the next healthy source and carries on from its last written byte; a worker that
+# finishes early takes half of the largest remaining segment. A source counts as
+# stalled when it goes silent for STALL_TIMEOUT or falls under the watchdog's floor.
+
+RACE_BYTES = 256 * 1024
+MIN_SEGMENT = 4 * 1024 * 1024
+STALL_TIMEOUT = 15
+MAX_SOURCE_FAILURES = 3
+STATE_SAVE_INTERVAL = 2
+
+
+def source_label(url):
+    return urlparse(url).hostname or url
+
+
+def source_headers(src, **extra):
+    """A source's request headers; 'headers' may be a callable for tokens that expire mid-job."""
+    headers = src.get('headers') or {}
+    return dict(headers() if callable(headers) else headers, **extra)
+
+
+def verify_sources(sources):
+    """
+    Keeps the sources that serve the same file as the first one with a known size.
+    Sizes must match and ranges must be supported; strong ETags must also match
+    when both sides send one (weak ETags are not comparable across servers).
+    """
+    ref = next((s for s in sources if s.get('probe') and s['probe'].get('size')), None)
+    if not ref: return 0, []
+    size = ref['probe']['size']
+    ref_etag = ref['probe'].get('etag') or ''
+    matching = []
+    for s in sources:
+        p = s.get('probe')
+        if not p or p.get('size') != size or not p.get('accept_ranges'): continue
+        etag = p.get('etag') or ''
+        if ref_etag and etag and not ref_etag.startswith('W/') and not etag.startswith('W/') and etag != ref_etag:
+            continue
+        matching.append(s)
+    return size, matching
+
+
+def race_sources(http, sources, offset=0, nbytes=RACE_BYTES, timeout=10):
+    """Fetches the same small range from every source at once; returns responders fastest-first with 'speed' set."""
+    def measure(src):
+        t0 = time.time()
+        try:
+            headers = source_headers(src, Range=f"bytes={offset}-{offset + nbytes - 1}")
+            with http.get(src['url'], headers=headers, stream=True, timeout=timeout) as r:
+                if r.status_code != 206: return 0
+                got = sum(len(c) for c in r.iter_content(64 * 1024))
+            return got / max(time.time() - t0, 1e-3)
+        except Exception:
+            return 0
+
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        speeds = list(pool.map(measure, sources))
+    for src, speed in zip(sources, speeds): src['speed'] = speed
+    return sorted([s for s in sources if s['speed'] > 0], key=lambda s: s['speed'], reverse=True)
+
+
+def plan_segments(start, end, sources, split=True, min_segment=MIN_SEGMENT):
+    """Splits [start, end) into one segment per source, sized by each source's raced speed."""
+    if end <= start: return []
+    if not split or len(sources) < 2 or end - start < 2 * min_segment:
+        return [{'pos': start, 'end': end, 'source': sources[0]['url'] if sources else None}]
+
+    total_speed = sum(s['speed'] for s in sources) or 1
+    segments, pos = [], start
+    for i, src in enumerate(sources):
+        if i == len(sources) - 1:
+            seg_end = end
+        else:
+            seg_end = min(end, pos + max(min_segment, int((end - start) * src['speed'] / total_speed)))
+        if seg_end > pos:
+            segments.append({'pos': pos, 'end': seg_end, 'source': src['url']})
+        pos = seg_end
+    return segments
+
+
+def load_segment_state(path, size):
+    try:
+        with open(path, 'r') as fh:
+            state = json.load(fh)
+        if state.get('size') != size: return None
+        return [{'pos': p, 'end': e, 'source': None} for p, e in state['segments'] if p < e]
+    except Exception:
+        return None
+
+
+class MirrorDownload:
+    """Runs one worker per segment against a shared FileSink until every byte is written."""
+
+    def __init__(self, http, sources, sink, segments, buffer_pool, should_stop, size, state_path=None):
+        self.http = http
+        self.sources = sources
+        self.sink = sink
+        self.segments = segments
+        self.buffer_pool = buffer_pool
+        self.should_stop = should_stop
+        self.size = size
+        self.state_path = state_path
+        self.error = None
+        self.lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.downloaded = size - sum(seg['end'] - seg['pos'] for seg in segments)
+        self.threads = []
+        self._last_save = 0
+        for src in sources:
+            src.setdefault('failures', 0)
+            src.setdefault('bytes', 0)
+
+    # --- STATE ---
+
+    @property
+    def complete(self):
+        with self.lock:
+            return all(seg['pos'] >= seg['end'] for seg in self.segments)
+
+    def active_labels(self):
+        with self.lock:
+            urls = {seg['source'] for seg in self.segments if seg['source'] and seg['pos'] < seg['end']}
+        return [s['label'] for s in self.sources if s['url'] in urls]
+
+    def save_state(self, force=False):
+        """Open ranges go to a sidecar so pause/restart resumes per segment instead of from the file size."""
+        if not self.state_path: return
+        if not force and time.time() - self._last_save < STATE_SAVE_INTERVAL: return
+        if not self._save_lock.acquire(blocking=force): return
+        try:
+            self._last_save = time.time()
+            with self.lock:
+                state = {'size': self.size, 'segments': [[s['pos'], s['end']] for s in self.segments if s['pos'] < s['end']]}
+            tmp = f"{self.state_path}.tmp"
+            with open(tmp, 'w') as fh:
+                json.dump(state, fh)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            print(f"Mirror State Error: {e}")
+        finally:
+            self._save_lock.release()
+
+    # --- WORKERS ---
+
+    def start(self):
+        self.threads = [threading.Thread(target=self._worker, args=(seg,), daemon=True)
+                        for seg in self.segments if seg['pos'] < seg['end']]
+        for t in self.threads: t.start()
+
+    def alive(self):
+        return any(t.is_alive() for t in self.threads)
+
+    def _halted(self):
+        return self.error is not None or self.should_stop()
+
+    def _worker(self, seg):
+        try:
+            while seg is not None and not self._halted():
+                self._fetch(seg)
+                seg = self._steal(seg['source'])
+        except Exception as e:
+            with self.lock:
+                if self.error is None: self.error = e
+
+    def _steal(self, preferred=None):
+        """Splits the largest unfinished segment in half so an idle worker can help with it."""
+        with self.lock:
+            open_segs = [s for s in self.segments if s['end'] - s['pos'] >= 2 * MIN_SEGMENT]
+            if not open_segs: return None
+            victim = max(open_segs, key=lambda s: s['end'] - s['pos'])
+            # The victim's in-flight chunk is at most one buffer past 'pos', far below the midpoint
+            mid = victim['pos'] + (victim['end'] - victim['pos']) // 2
+            seg = {'pos': mid, 'end': victim['end'], 'source': preferred}
+            victim['end'] = mid
+            self.segments.append(seg)
+            return seg
+
+    def _pick_source(self, preferred):
+        with self.lock:
+            healthy = [s for s in self.sources if s['failures'] < MAX_SOURCE_FAILURES]
+        if not healthy: return None
+        # Keep the assigned source while it works; after a failure move to the least-failed one
+        return next((s for s in healthy if s['url'] == preferred), None) or min(healthy, key=lambda s: s['failures'])
+
+    def _fetch(self, seg):
+        while not self._halted():
+            with self.lock:
+                if seg['pos'] >= seg['end']: return
+            src = self._pick_source(seg['source'])
+            if not src: raise IOError("All sources failed")
+            seg['source'] = src['url']
+            start = seg['pos']
+            try:
+                self._stream(seg, src)
+            except Exception as e:
+                print(f"Mirror Error ({src['label']}): {e}")
+                with self.lock:
+                    # A source that delivered since its last error is flaky, not dead; only back-to-back failures count
+                    if seg['pos'] > start: src['failures'] = 0
+                    src['failures'] += 1
+                    seg['source'] = None
+            else:
+                with self.lock:
+                    if seg['pos'] > start: src['failures'] = 0
+
+    def _stream(self, seg, src):
+        headers = source_headers(src, Range=f"bytes={seg['pos']}-{seg['end'] - 1}")
+        watchdog = ThroughputWatchdog(idle=STALL_TIMEOUT)
+        with self.http.get(src['url'], headers=headers, stream=True, timeout=watchdog.timeout) as r:
+            if r.status_code != 206:
+                raise IOError(f"Range not honoured (HTTP {r.status_code})")
+            with self.buffer_pool.buffer() as buf:
+                for view in read_chunks(raw_reader(r), buf, watchdog.read_size):
+                    if self._halted(): return
+                    with self.lock:
+                        offset = seg['pos']
+                        n = min(len(view), seg['end'] - offset)
+                    if n <= 0: return
+                    self.sink.write_at(view[:n], offset)
+                    watchdog.feed(n)
+                    with self.lock:
+                        seg['pos'] += n
+                        self.downloaded += n
+                        src['bytes'] += n
+                    self.save_state()
+                    watchdog.check()
+        with self.lock:
+            if seg['pos'] < seg['end']: raise IOError("Connection closed early")
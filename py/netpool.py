@@ -0,0 +1,186 @@
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import requests
+import urllib3.util.connection as urllib3_connection
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+# --- SHARED CONNECTION POOL ---
+# Every outbound requests call goes through the same adapters, so keep-alive
+# connections (and their TLS sessions) are reused across jobs, player range
+# requests and probes. Sessions stay per-job for headers/cookies; only the
+# adapters -- which own the connection pools -- are shared.
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+DEFAULT_HOST_LIMIT = int(os.environ.get('POOL_HOST_LIMIT', 16))
+MAX_POOLED_HOSTS = 64
+POOL_TIMEOUT = float(os.environ.get('POOL_TIMEOUT', 30))  # seconds to wait for a free connection to a capped host
+DNS_TTL = int(os.environ.get('DNS_CACHE_TTL', 300))
+# Hosts that see most of the traffic get a larger per-host connection cap
+HOST_LIMITS = {
+    'www.googleapis.com': 32,
+}
+
+_stats_lock = threading.Lock()
+_host_stats = defaultdict(lambda: {'requests': 0, 'new_connections': 0})
+_dns_stats = {'hits': 0, 'misses': 0}
+
+
+# --- DNS CACHE ---
+
+class DNSCache:
+    """Small TTL'd getaddrinfo cache; failed lookups are never cached."""
+
+    def __init__(self, ttl=DNS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def resolve(self, host, port):
+        key = (host, port)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] < self.ttl:
+                _dns_stats['hits'] += 1
+                return entry[1]
+        infos = socket.getaddrinfo(host, port, urllib3_connection.allowed_gai_family(), socket.SOCK_STREAM)
+        addrs = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            _dns_stats['misses'] += 1
+            self._entries[key] = (now, addrs)
+        return addrs
+
+    def evict(self, host, port):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+dns_cache = DNSCache()
+_original_create_connection = urllib3_connection.create_connection
+
+
+def _is_ip(host):
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except (OSError, ValueError):
+            pass
+    return False
+
+
+def _create_connection(address, *args, **kwargs):
+    """urllib3 calls this once per new TCP connection; TLS still verifies against the hostname."""
+    host, port = address
+    host = host.strip('[]')
+    with _stats_lock:
+        _host_stats[host]['new_connections'] += 1
+    if _is_ip(host):
+        return _original_create_connection(address, *args, **kwargs)
+
+    err = None
+    for addr in dns_cache.resolve(host, port):
+        try:
+            return _original_create_connection((addr, port), *args, **kwargs)
+        except OSError as e:
+            err = e
+    # Every cached address failed; the host may have moved, so look it up fresh next time
+    dns_cache.evict(host, port)
+    raise err or OSError(f"No addresses for {host}")
+
+
+urllib3_connection.create_connection = _create_connection
+
+
+# --- ADAPTERS ---
+
+class _BoundedWaitMixin:
+    # requests never passes pool_timeout, so a full blocking pool would otherwise wait forever
+    def _get_conn(self, timeout=None):
+        return super()._get_conn(timeout=POOL_TIMEOUT if timeout is None else timeout)
+
+
+class BoundedHTTPConnectionPool(_BoundedWaitMixin, HTTPConnectionPool):
+    pass
+
+
+class BoundedHTTPSConnectionPool(_BoundedWaitMixin, HTTPSConnectionPool):
+    pass
+
+
+class CountingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': BoundedHTTPConnectionPool, 'https': BoundedHTTPSConnectionPool}
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).hostname or ''
+        with _stats_lock:
+            _host_stats[host]['requests'] += 1
+        try:
+            return super().send(request, **kwargs)
+        except EmptyPoolError as e:
+            # Surface as a requests error so callers' retry/backoff handling applies
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+
+def _adapter(limit):
+    # pool_block caps concurrent connections per host instead of opening throwaway extras
+    return CountingAdapter(pool_connections=MAX_POOLED_HOSTS, pool_maxsize=limit, pool_block=True, max_retries=3)
+
+
+default_adapter = _adapter(DEFAULT_HOST_LIMIT)
+host_adapters = {host: _adapter(limit) for host, limit in HOST_LIMITS.items()}
+
+
+def mount_shared(session):
+    session.mount('http://', default_adapter)
+    session.mount('https://', default_adapter)
+    for host, adapter in host_adapters.items():
+        session.mount(f'https://{host}/', adapter)
+    return session
+
+
+def new_session(headers=None):
+    """A fresh Session (own headers and cookies) that borrows the process-wide connection pools."""
+    session = mount_shared(requests.Session())
+    session.headers.update({'User-Agent': USER_AGENT})
+    if headers: session.headers.update(headers)
+    return session
+
+
+# Shared session for one-off calls that carry no per-job state
+http = new_session()
+
+
+# --- STATS ---
+
+def pool_stats():
+    with _stats_lock:
+        hosts = {h: dict(s) for h, s in _host_stats.items()}
+        dns = dict(_dns_stats)
+    total_requests = sum(s['requests'] for s in hosts.values())
+    total_new = sum(s['new_connections'] for s in hosts.values())
+    for s in hosts.values():
+        s['reused'] = max(s['requests'] - s['new_connections'], 0)
+        s['reuse_rate'] = round(s['reused'] / s['requests'], 3) if s['requests'] else 0
+    reused = max(total_requests - total_new, 0)
+    return {
+        'requests': total_requests,
+        'new_connections': total_new,
+        'handshakes_avoided': reused,
+        'reuse_rate': round(reused / total_requests, 3) if total_requests else 0,
+        'dns': dns,
+        'hosts': hosts
+    }
@@ -0,0 +1,123 @@
+import re
+import threading
+import time
+
+# --- URL PROBES ---
+# A probe records what we need to know about a URL before downloading it, so the
+# UI's /detect_filename call and the downloader share one origin round trip.
+
+PROBE_TTL = 60
+PROBE_CACHE_SIZE = 256
+PROBE_HEADERS = ('content-disposition', 'content-type', 'content-length', 'content-range',
+                 'accept-ranges', 'etag', 'last-modified')
+
+
+class ProbeResult(dict):
+    """Plain dict so it can be returned from routes as-is; 'headers' keeps the lowercase raw values."""
+
+    @property
+    def resumable(self):
+        return self.get('accept_ranges', False)
+
+
+def _size_from(headers, status):
+    # A 206 to 'bytes=0-0' carries the real length in Content-Range ("bytes 0-0/12345")
+    m = re.search(r'/(\d+)\s*$', headers.get('content-range', ''))
+    if m: return int(m.group(1))
+    if status == 200 and headers.get('content-length', '').isdigit():
+        return int(headers['content-length'])
+    return 0
+
+
+def probe_url(http, url, headers=None, timeout=10, name_resolver=None):
+    """
+    HEADs the URL, falling back to a one-byte ranged GET when the origin rejects
+    or mishandles HEAD. `http` is the requests module or any Session.
+    """
+    resp, method = None, 'head'
+    try:
+        resp = http.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+        if resp.status_code >= 400: resp = None
+    except Exception:
+        resp = None
+
+    if resp is None:
+        method = 'range_get'
+        get_headers = dict(headers or {}, Range='bytes=0-0')
+        resp = http.get(url, headers=get_headers, timeout=timeout, allow_redirects=True, stream=True)
+        # Draining the single byte keeps the connection reusable; a server that ignored
+        # Range is about to send the whole file, so that one is dropped instead
+        if resp.status_code == 206: resp.content
+        resp.close()
+        resp.raise_for_status()
+
+    raw = {k: resp.headers[k] for k in PROBE_HEADERS if k in resp.headers}
+    result = ProbeResult(
+        url=url,
+        final_url=resp.url or url,
+        status=resp.status_code,
+        method=method,
+        size=_size_from(raw, resp.status_code),
+        accept_ranges=resp.status_code == 206 or raw.get('accept-ranges', '').lower() == 'bytes',
+        etag=raw.get('etag'),
+        last_modified=raw.get('last-modified'),
+        headers=raw,
+        probed_at=time.time()
+    )
+    result['filename'] = name_resolver(result) if name_resolver else None
+    return result
+
+
+class ProbeCache:
+    """Short-lived, thread-safe probe cache with in-flight de-duplication per URL."""
+
+    def __init__(self, ttl=PROBE_TTL, max_entries=PROBE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry['probed_at'] < self.ttl: return entry
+            self._entries.pop(key, None)
+            return None
+
+    def put(self, key, result):
+        result.setdefault('probed_at', time.time())
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        return result
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_or_probe(self, key, prober):
+        """Returns a cached probe or runs prober(); concurrent callers for the same key wait for one probe."""
+        cached = self.get(key)
+        if cached: return cached
+
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+
+        if not owner:
+            event.wait(30)
+            cached = self.get(key)
+            if cached: return cached
+            return self.put(key, prober())
+
+        try:
+            return self.put(key, prober())
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
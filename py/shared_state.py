@@ -0,0 +1,182 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import socketio
+
+# --- SHARED STATE ---
+# With several gunicorn workers each process only holds the jobs it started.
+# Job ownership, the last progress payload and pause/resume/cancel requests live
+# in a backend every worker can see, so a control event that lands on the wrong
+# worker is forwarded to the owner. LocalState keeps today's single-process
+# behaviour; SQLiteState shares everything through one database file.
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+WORKER_TIMEOUT = 30
+MESSAGE_RETENTION = 60
+
+
+def connect_sqlite(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class LocalState:
+    """Single-process backend: every job is local, so there is nothing to forward."""
+
+    shared = False
+
+    def heartbeat(self, owner): pass
+
+    def claim_job(self, job_id, owner): pass
+
+    def release_job(self, job_id): pass
+
+    def job_owner(self, job_id): return None
+
+    def update_job(self, job_id, status=None, paused=False): pass
+
+    def jobs(self): return []
+
+    def send_control(self, job_id, action): return False
+
+    def take_controls(self, owner): return []
+
+    def acquire_lease(self, name, owner, ttl): return True
+
+
+class SQLiteState(LocalState):
+    """File-backed backend shared by all workers on one host."""
+
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = connect_sqlite(path)
+        with self._lock:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS workers (owner TEXT PRIMARY KEY, seen REAL);
+                CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, owner TEXT, status TEXT, paused INTEGER DEFAULT 0, updated REAL);
+                CREATE TABLE IF NOT EXISTS controls (id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT, owner TEXT, action TEXT);
+                CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT, expires REAL);
+            """)
+
+    def _exec(self, sql, args=()):
+        with self._lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def heartbeat(self, owner):
+        now = time.time()
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO workers (owner, seen) VALUES (?, ?)", (owner, now))
+            # Jobs of a worker that stopped heartbeating can never be controlled again
+            self.conn.execute("DELETE FROM jobs WHERE owner IN (SELECT owner FROM workers WHERE seen < ?)", (now - WORKER_TIMEOUT,))
+            self.conn.execute("DELETE FROM workers WHERE seen < ?", (now - WORKER_TIMEOUT,))
+
+    def claim_job(self, job_id, owner):
+        self._exec("INSERT OR REPLACE INTO jobs (job_id, owner, status, paused, updated) VALUES (?, ?, NULL, 0, ?)",
+                   (job_id, owner, time.time()))
+
+    def release_job(self, job_id):
+        self._exec("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def job_owner(self, job_id):
+        rows = self._exec("SELECT owner FROM jobs WHERE job_id = ?", (job_id,))
+        return rows[0][0] if rows else None
+
+    def update_job(self, job_id, status=None, paused=False):
+        self._exec("UPDATE jobs SET status = ?, paused = ?, updated = ? WHERE job_id = ?",
+                   (json.dumps(status) if status else None, int(bool(paused)), time.time(), job_id))
+
+    def jobs(self):
+        rows = self._exec("SELECT job_id, owner, status, paused FROM jobs")
+        return [{'job_id': j, 'owner': o, 'status': json.loads(s) if s else None, 'paused': bool(p)} for j, o, s, p in rows]
+
+    def send_control(self, job_id, action):
+        owner = self.job_owner(job_id)
+        if not owner: return False
+        self._exec("INSERT INTO controls (job_id, owner, action) VALUES (?, ?, ?)", (job_id, owner, action))
+        return True
+
+    def take_controls(self, owner):
+        with self._lock:
+            rows = self.conn.execute("SELECT id, job_id, action FROM controls WHERE owner = ? ORDER BY id", (owner,)).fetchall()
+            if rows:
+                self.conn.execute(f"DELETE FROM controls WHERE id IN ({','.join('?' * len(rows))})", [r[0] for r in rows])
+        return [(job_id, action) for _, job_id, action in rows]
+
+    def acquire_lease(self, name, owner, ttl):
+        """Leader election for once-per-host work (e.g. Drive sync): holds while renewed within ttl."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+                if row and row[0] != owner and row[1] > now:
+                    return False
+                self.conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)", (name, owner, now + ttl))
+                return True
+            finally:
+                self.conn.execute("COMMIT")
+
+
+class SQLiteMessageQueue(socketio.PubSubManager):
+    """
+    Socket.IO client manager that fans emits out to every worker through a table
+    in the shared database, so no Redis/AMQP service is needed on a single host.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, channel='socketio', write_only=False, logger=None, json=None, poll_interval=0.05):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self.conn = connect_sqlite(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS socketio_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, payload TEXT, created REAL)")
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+
+    def _publish(self, data):
+        with self._lock:
+            self.conn.execute("INSERT INTO socketio_messages (channel, payload, created) VALUES (?, ?, ?)",
+                              (self.channel, self.json.dumps(data), time.time()))
+
+    def _listen(self):
+        with self._lock:
+            row = self.conn.execute("SELECT MAX(id) FROM socketio_messages").fetchone()
+        last_id = row[0] or 0
+        last_prune = 0
+        while True:
+            with self._lock:
+                rows = self.conn.execute("SELECT id, payload FROM socketio_messages WHERE id > ? AND channel = ? ORDER BY id",
+                                         (last_id, self.channel)).fetchall()
+                now = time.time()
+                if now - last_prune > MESSAGE_RETENTION:
+                    self.conn.execute("DELETE FROM socketio_messages WHERE created < ?", (now - MESSAGE_RETENTION,))
+                    last_prune = now
+            for msg_id, payload in rows:
+                last_id = msg_id
+                # JSON, never pickle: whoever can write the database file must not be able to run code in workers
+                try:
+                    message = self.json.loads(payload)
+                except (TypeError, ValueError):
+                    continue
+                yield message
+            if not rows:
+                time.sleep(self.poll_interval)
+
+
+def create_state(path=None):
+    return SQLiteState(path) if path else LocalState()
+
+
+def create_message_queue(path=None):
+    """None keeps Flask-SocketIO's default in-process manager."""
+    return SQLiteMessageQueue(path) if path else None
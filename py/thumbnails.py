@@ -0,0 +1,211 @@
+import importlib.util
+import json
+import math
+import mimetypes
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# --- VIDEO PREVIEWS ---
+# A poster frame and a seek-preview sprite sheet are rendered once, right after a
+# download finishes and while the file is still on local disk, then kept under
+# <cache>/<gdrive_id>/ forever. Viewing the library never touches the video again.
+#
+# Each render runs in its own short-lived interpreter: OpenCV decoding is CPU bound
+# and can crash on a bad file, and multiprocessing workers forked from the
+# eventlet-patched server are not safe. The thread pool in front only bounds how
+# many renders run at once.
+
+PREVIEW_FILES = ('poster.jpg', 'sprite.jpg', 'sprite.json')
+POSTER_WIDTH = 480
+POSTER_AT = 0.1  # Fraction of the duration; skips black leaders and intros
+TILE_WIDTH = 160
+SPRITE_COLS = 10
+SPRITE_MAX_TILES = 100
+JPEG_QUALITY = 80
+RENDER_TIMEOUT = 300
+MAX_RENDERS = int(os.environ.get('PREVIEW_WORKERS', 2))
+
+
+def opencv_available():
+    """Checks for cv2 without importing it into the server process."""
+    return importlib.util.find_spec('cv2') is not None
+
+
+def is_video(filename):
+    return (mimetypes.guess_type(filename or '')[0] or '').startswith('video/')
+
+
+# --- RENDERING (child process) ---
+
+def _grab(cv2, cap, seconds):
+    cap.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+    ok, frame = cap.read()
+    return frame if ok else None
+
+
+def _scale(cv2, frame, width):
+    h, w = frame.shape[:2]
+    height = max(2, int(round(h * width / w / 2)) * 2)
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def render_previews(video_path, out_dir):
+    """Writes poster.jpg, sprite.jpg and sprite.json into out_dir. Returns the sprite metadata or None."""
+    import cv2
+    import numpy as np
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened(): return None
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        duration = frames / fps if fps > 0 and frames > 0 else 0
+        if duration <= 0: return None
+        os.makedirs(out_dir, exist_ok=True)
+        quality = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+
+        poster = _grab(cv2, cap, duration * POSTER_AT)
+        if poster is None: poster = _grab(cv2, cap, 0)
+        if poster is None: return None
+        cv2.imwrite(os.path.join(out_dir, 'poster.jpg'), _scale(cv2, poster, POSTER_WIDTH), quality)
+
+        # At most one tile per second, sampled from the middle of each interval
+        count = max(1, min(SPRITE_MAX_TILES, int(duration)))
+        interval = duration / count
+        tiles = []
+        for i in range(count):
+            frame = _grab(cv2, cap, (i + 0.5) * interval)
+            if frame is None: break
+            tiles.append(_scale(cv2, frame, TILE_WIDTH))
+        if not tiles: tiles = [_scale(cv2, poster, TILE_WIDTH)]
+
+        tile_h = tiles[0].shape[0]
+        cols = min(SPRITE_COLS, len(tiles))
+        rows = math.ceil(len(tiles) / cols)
+        sheet = np.zeros((rows * tile_h, cols * TILE_WIDTH, 3), dtype=np.uint8)
+        for i, tile in enumerate(tiles):
+            r, c = divmod(i, cols)
+            tile = tile[:tile_h, :TILE_WIDTH]
+            sheet[r * tile_h:r * tile_h + tile.shape[0], c * TILE_WIDTH:c * TILE_WIDTH + tile.shape[1]] = tile
+        cv2.imwrite(os.path.join(out_dir, 'sprite.jpg'), sheet, quality)
+
+        meta = {
+            'duration': round(duration, 3),
+            'interval': round(duration / len(tiles), 3),
+            'count': len(tiles),
+            'cols': cols,
+            'rows': rows,
+            'tile_width': TILE_WIDTH,
+            'tile_height': tile_h,
+        }
+        with open(os.path.join(out_dir, 'sprite.json'), 'w') as fh:
+            json.dump(meta, fh)
+        return meta
+    finally:
+        cap.release()
+
+
+# --- CACHE (server process) ---
+
+class PreviewJob:
+    """A render in flight for one downloaded file, staged until the Drive ID is known."""
+
+    def __init__(self, staging, future):
+        self.staging = staging
+        self.future = future
+
+
+class PreviewCache:
+    """Renders previews in bounded child processes and serves them from cache_dir/<file_id>/."""
+
+    def __init__(self, cache_dir, max_workers=MAX_RENDERS, enabled=None):
+        self.cache_dir = cache_dir
+        self.staging_dir = os.path.join(cache_dir, '.staging')
+        self.enabled = opencv_available() if enabled is None else enabled
+        self.max_workers = max_workers
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='preview')
+        return self._pool
+
+    def _run(self, video_path, staging):
+        try:
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), video_path, staging],
+                                  capture_output=True, timeout=RENDER_TIMEOUT)
+            if proc.returncode != 0:
+                print(f"Preview Error: {proc.stderr.decode(errors='replace').strip()[-300:]}")
+                return False
+            return all(os.path.exists(os.path.join(staging, n)) for n in PREVIEW_FILES)
+        except Exception as e:
+            print(f"Preview Error: {e}")
+            return False
+
+    def submit(self, video_path):
+        """Starts rendering a local file. Returns a PreviewJob, or None for non-videos or without OpenCV."""
+        if not self.enabled or not is_video(video_path) or not os.path.exists(video_path): return None
+        staging = os.path.join(self.staging_dir, uuid.uuid4().hex)
+        return PreviewJob(staging, self._executor().submit(self._run, video_path, staging))
+
+    def commit(self, job, file_id, then=None):
+        """
+        Files the render under file_id once it finishes, without waiting for it. The
+        source file must stay on disk until then(ok) is called.
+        """
+        if not job: return self._then(then, False)
+        job.future.add_done_callback(lambda future: self._then(then, self._file(job, future, file_id)))
+
+    def discard(self, job, then=None):
+        """Drops a render. then() is called once nothing reads the source file any more."""
+        if not job or job.future.cancel():
+            if job: shutil.rmtree(job.staging, ignore_errors=True)
+            return self._then(then, False)
+        job.future.add_done_callback(lambda future: self._then(then, self._file(job, future, None)))
+
+    def _file(self, job, future, file_id):
+        # Runs once the child has exited (RENDER_TIMEOUT kills it), so staging is safe to move or delete
+        try:
+            if future.cancelled() or not future.result() or not file_id: return False
+            target = self.path(file_id)
+            if not target: return False
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(job.staging, target)
+            return True
+        except Exception as e:
+            print(f"Preview Error: {e}")
+            return False
+        finally:
+            shutil.rmtree(job.staging, ignore_errors=True)
+
+    def _then(self, then, ok):
+        if not then: return
+        try:
+            then(ok)
+        except Exception as e:
+            print(f"Preview Error: {e}")
+
+    def path(self, file_id, name=None):
+        """Cache path for a Drive ID (None for IDs that are not plain Drive IDs)."""
+        if not file_id or not all(c.isalnum() or c in '-_' for c in file_id): return None
+        base = os.path.join(self.cache_dir, file_id)
+        return os.path.join(base, name) if name else base
+
+    def available(self):
+        """IDs with cached previews, from one directory listing rather than a stat per file."""
+        try:
+            return {name for name in os.listdir(self.cache_dir) if not name.startswith('.')}
+        except OSError:
+            return set()
+
+    def remove(self, file_id):
+        target = self.path(file_id)
+        if target: shutil.rmtree(target, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if render_previews(sys.argv[1], sys.argv[2]) else 1)
@@ -0,0 +1,103 @@
+import http.client
+import os
+import random
+import time
+from collections import deque
+
+import requests
+import urllib3
+
+# --- THROUGHPUT WATCHDOG ---
+# Request timeouts only cover connecting and a fully silent socket. A body that
+# slows to a trickle, or a socket that drops mid-transfer, should not hang a job
+# or end it with an error. The watchdog measures throughput over a sliding window
+# and raises StallError when it falls under the floor. The caller then reconnects
+# with a Range from the last written byte, backing off exponentially with jitter.
+
+MIN_SPEED = int(os.environ.get('DOWNLOAD_MIN_SPEED', 32 * 1024))  # bytes/s averaged over SLOW_WINDOW
+SLOW_WINDOW = int(os.environ.get('DOWNLOAD_SLOW_WINDOW', 30))
+IDLE_TIMEOUT = int(os.environ.get('DOWNLOAD_IDLE_TIMEOUT', 20))  # socket read timeout: no bytes at all
+MAX_RECONNECTS = int(os.environ.get('DOWNLOAD_RETRIES', 8))
+BACKOFF_BASE = 1
+BACKOFF_MAX = 60
+MIN_READ = 16 * 1024
+
+
+class TransientError(IOError):
+    """A failure worth reconnecting for (stall, early close, 5xx/429)."""
+
+
+class StallError(TransientError):
+    """Throughput stayed under the floor for a whole window."""
+
+
+# Network failures that a reconnect can fix. Deliberately not OSError: disk errors must not be retried.
+RETRYABLE_ERRORS = (
+    TransientError,
+    ConnectionError,
+    TimeoutError,
+    http.client.HTTPException,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.ReadTimeoutError,
+)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Exponential backoff with jitter, so jobs hitting the same origin don't reconnect in lockstep."""
+    return random.uniform(base, min(cap, base * 2 ** attempt))
+
+
+def is_retryable_status(status):
+    return status == 429 or status >= 500
+
+
+class ThroughputWatchdog:
+    """Tracks bytes received on one connection and decides when it has stalled."""
+
+    def __init__(self, min_speed=MIN_SPEED, window=SLOW_WINDOW, idle=IDLE_TIMEOUT, clock=time.monotonic):
+        self.min_speed = min_speed
+        self.window = window
+        self.idle = idle
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        """Call on every (re)connect; a new connection gets a full window before it is judged."""
+        now = self.clock()
+        self.started = now
+        self.received = 0
+        self._samples = deque([(now, 0)])
+
+    def feed(self, n):
+        self.received += n
+        now = self.clock()
+        self._samples.append((now, self.received))
+        # Keep one sample at or before the window start so the rate always spans the full window
+        while len(self._samples) > 2 and self._samples[1][0] <= now - self.window:
+            self._samples.popleft()
+
+    def speed(self):
+        now = self.clock()
+        t0, b0 = self._samples[0]
+        return (self.received - b0) / max(now - t0, 1e-3)
+
+    def check(self):
+        if not self.min_speed or self.clock() - self.started < self.window: return
+        speed = self.speed()
+        if speed < self.min_speed:
+            raise StallError(f"Stalled at {speed / 1024:.1f} KB/s over {self.window}s")
+
+    def read_size(self, limit):
+        """
+        Reads block until the view is full, so a 1 MB read on a trickle could outlast
+        the window. Sizing reads to about a second of recent throughput keeps checks
+        frequent on slow links while fast links still fill the whole buffer.
+        """
+        return max(MIN_READ, min(limit, int(self.speed())))
+
+    @property
+    def timeout(self):
+        return (10, self.idle)
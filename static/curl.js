@@ -127,6 +127,13 @@ socket.on('download_complete', (data) => handleComplete(data));
 socket.on('download_error', (data) => handleError(data));
 socket.on('download_paused', (data) => handlePaused(data));
 
+// Drive sync pushes deltas; coalesce bursts into a single library refresh
+let libraryRefreshTimer;
+socket.on('library_updated', () => {
+    clearTimeout(libraryRefreshTimer);
+    libraryRefreshTimer = setTimeout(loadSavedFiles, 500);
+});
+
 // --- DIRECT DOWNLOAD FORM ---
 if(document.getElementById('downloadForm')) {
     document.getElementById('downloadForm').addEventListener('submit', (e) => {
@@ -135,16 +142,20 @@ if(document.getElementById('downloadForm')) {
         const custom = document.getElementById('customFilename').value.trim();
         const mode = custom ? 'custom' : 'original';
         if(!url) return showToast('Please enter a URL', 'danger');
+        const mirrorInput = document.getElementById('mirrorUrls');
+        const mirrors = mirrorInput ? mirrorInput.value.split(/\s+/).map(m => m.trim()).filter(m => m) : [];
         
         showActiveDownloads();
         socket.emit('start_download', {
             url: url,
+            mirrors: mirrors,
             filename_mode: mode,
             custom_filename: custom,
             mode: 'direct'
         });
         showToast('Download started', 'primary');
         document.getElementById('url').value = '';
+        if(mirrorInput) mirrorInput.value = '';
         document.getElementById('customFilename').value = '';
         document.getElementById('filenamePreviewWrapper').style.display = 'none';
     });
@@ -337,7 +348,12 @@ function updateDownloadUI(data) {
     } else {
         bar.classList.remove('bg-info', 'progress-bar-striped', 'progress-bar-animated');
         bar.classList.add('bg-primary');
-        statusText.innerHTML = 'Downloading...';
+        if (data.reconnecting) {
+            statusText.innerHTML = `<span class="text-warning"><i class="bi bi-arrow-repeat"></i> Connection stalled, reconnecting (${data.retry}/${data.max_retries})...</span>`;
+        } else {
+            const via = data.source ? `Downloading via ${data.source}...` : 'Downloading...';
+            statusText.innerText = data.retries ? `${via} (reconnected ${data.retries}x)` : via;
+        }
         metaIcon.className = 'bi bi-hdd me-1 meta-icon';
     }
     
@@ -511,7 +527,13 @@ function cancelDownload(id) {
     });
 }
 
-function deleteFile(filename) {
+function libraryDomId(key) {
+    return key.replace(/[^a-zA-Z0-9_-]/g, '');
+}
+
+function deleteFile(id) {
+    const el = document.getElementById(`file-${libraryDomId(id)}`);
+    const filename = el ? el.dataset.name : id;
     showConfirm({
         title: 'Delete File?',
         message: `Permanently delete "${filename}"?`,
@@ -519,14 +541,12 @@ function deleteFile(filename) {
         btnClass: 'btn-danger',
         iconClass: 'bi-trash3 text-danger'
     }, () => {
-        const safeId = filename.replace(/[^a-zA-Z0-9]/g, '');
-        const el = document.getElementById(`file-${safeId}`);
         if(el) el.style.opacity = '0.5';
 
         fetch('/delete_file', {
             method: 'POST',
             headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({filename: filename})
+            body: JSON.stringify({id: id})
         })
         .then(r => r.json())
         .then(data => {
@@ -733,21 +753,28 @@ function loadSavedFiles() {
              c.innerHTML = '<div class="text-center text-muted p-3">No active downloads finished yet.</div>';
         } else {
             c.innerHTML = data.files.map(f => {
+                const key = f.gdrive_id || 'local:' + f.name;
                 const iconClass = getFileIcon(f.name);
                 const showPlay = isVideo(f.name);
                 
                 const playBtn = showPlay ? 
-                    `<button class="btn btn-sm btn-outline-primary border-0 me-1" onclick="openPlayer('${f.name}', '${f.gdrive_id || ''}')" title="Play Video"><i class="bi bi-play-circle-fill fs-5"></i></button>` 
+                    `<button class="btn btn-sm btn-outline-primary border-0 me-1" onclick="openPlayer('${f.name}', '${f.gdrive_id || ''}', ${!!f.preview})" title="Play Video"><i class="bi bi-play-circle-fill fs-5"></i></button>` 
                     : '';
 
+                // Poster frames are rendered once after download and cached by the browser for good
+                const thumb = f.preview ?
+                    `<img class="library-poster me-3" src="/preview/${f.gdrive_id}/poster.jpg" loading="lazy" alt="">`
+                    : `<span class="fs-4 me-3"><i class="bi ${iconClass}"></i></span>`;
+
                 const downloadBtn = f.gdrive_id ? 
                     `<a href="/download_drive/${f.gdrive_id}" class="btn btn-sm btn-outline-success border-0 me-1" title="Download"><i class="bi bi-cloud-download fs-5"></i></a>` 
                     : '';
 
                 return `
-                <div class="card saved-file-card mb-2" id="file-${f.name.replace(/[^a-zA-Z0-9]/g, '')}">
+                <div class="card saved-file-card mb-2" id="file-${libraryDomId(key)}" data-name="${f.name}">
                     <div class="card-body p-2 d-flex align-items-center">
-                        <span class="fs-4 me-3"><i class="bi ${iconClass}"></i></span>
+                        <input class="form-check-input me-2 library-select" type="checkbox" value="${key}" onchange="updateBulkBar()">
+                        ${thumb}
                         <div class="overflow-hidden me-auto">
                             <div class="fw-bold text-truncate" title="${f.name}">${f.name}</div>
                             <small class="text-muted">${formatBytes(f.size)} • ${f.date}</small>
@@ -755,18 +782,56 @@ function loadSavedFiles() {
                         <div class="d-flex align-items-center">
                             ${downloadBtn}
                             ${playBtn}
-                            <button class="btn btn-sm btn-outline-danger border-0" onclick="deleteFile('${f.name}')" title="Delete"><i class="bi bi-trash"></i></button>
+                            <button class="btn btn-sm btn-outline-danger border-0" onclick="deleteFile('${key}')" title="Delete"><i class="bi bi-trash"></i></button>
                         </div>
                     </div>
                 </div>`;
             }).join('');
         }
+        updateBulkBar();
         setTimeout(() => { 
             if(refreshIcon) refreshIcon.classList.remove('rotate-anim'); 
         }, 500);
     });
 }
 
+function selectedLibraryIds() {
+    return Array.from(document.querySelectorAll('.library-select:checked')).map(cb => cb.value);
+}
+
+function updateBulkBar() {
+    const count = selectedLibraryIds().length;
+    document.querySelectorAll('.bulk-delete-btn').forEach(btn => {
+        btn.style.display = count ? 'inline-block' : 'none';
+        btn.innerHTML = `<i class="bi bi-trash"></i> Delete ${count}`;
+    });
+}
+
+function bulkDeleteSelected() {
+    const ids = selectedLibraryIds();
+    if (!ids.length) return;
+    showConfirm({
+        title: 'Delete Files?',
+        message: `Permanently delete ${ids.length} selected file(s)?`,
+        btnText: 'Delete',
+        btnClass: 'btn-danger',
+        iconClass: 'bi-trash3 text-danger'
+    }, () => {
+        fetch('/bulk/delete', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({ids: ids})
+        })
+        .then(r => r.json())
+        .then(data => {
+            const failed = data.results.filter(r => !r.success).length;
+            if (failed) showToast(`${ids.length - failed} deleted, ${failed} failed`, 'warning');
+            else showToast(`${ids.length} files deleted`, 'success');
+            loadSavedFiles();
+        });
+    });
+}
+
 // =========================================================
 // 6. PLAYER CONTROLLER LOGIC
 // =========================================================
@@ -798,9 +863,11 @@ const zoomModes = ['contain', 'fill', 'cover', 'smart-crop'];
 const zoomIcons = ['fa-expand', 'fa-arrows-alt-h', 'fa-compress-arrows-alt', 'fa-crop'];
 const fsBtn = document.getElementById('fsBtn');
 
-function openPlayer(filename, driveId = null) {
+function openPlayer(filename, driveId = null, hasPreview = false) {
     if(videoTitle) videoTitle.innerText = filename;
     let streamUrl = driveId ? `/stream_drive/${driveId}` : `/stream/${encodeURIComponent(filename)}`;
+    video.poster = (driveId && hasPreview) ? `/preview/${driveId}/poster.jpg` : '';
+    loadSeekSprite(driveId && hasPreview ? driveId : null);
     video.src = streamUrl;
     video.playbackRate = 1.0;
     video.volume = 1.0;
@@ -1184,6 +1251,43 @@ progressBg.addEventListener('click', (e) => {
     video.currentTime = pos * video.duration;
 });
 
+// --- SEEK PREVIEW ---
+let seekSprite = null;
+const seekPreview = document.getElementById('seekPreview');
+
+function loadSeekSprite(driveId) {
+    seekSprite = null;
+    if (seekPreview) seekPreview.style.display = 'none';
+    if (!driveId || !seekPreview) return;
+    fetch(`/preview/${driveId}/sprite.json`)
+    .then(r => r.ok ? r.json() : null)
+    .then(meta => {
+        if (!meta) return;
+        seekSprite = { ...meta, url: `/preview/${driveId}/sprite.jpg` };
+        seekPreview.style.width = meta.tile_width + 'px';
+        seekPreview.style.height = meta.tile_height + 'px';
+        seekPreview.style.backgroundImage = `url('${seekSprite.url}')`;
+    })
+    .catch(() => {});
+}
+
+progressBg.addEventListener('mousemove', (e) => {
+    if (!seekSprite || !seekPreview) return;
+    const rect = progressBg.getBoundingClientRect();
+    const pos = Math.min(Math.max((e.clientX - rect.left) / rect.width, 0), 1);
+    const duration = video.duration || seekSprite.duration;
+    const idx = Math.min(Math.floor(pos * duration / seekSprite.interval), seekSprite.count - 1);
+    const col = idx % seekSprite.cols, row = Math.floor(idx / seekSprite.cols);
+    seekPreview.style.backgroundPosition = `-${col * seekSprite.tile_width}px -${row * seekSprite.tile_height}px`;
+    const half = seekSprite.tile_width / 2;
+    seekPreview.style.left = Math.min(Math.max(pos * rect.width, half), rect.width - half) + 'px';
+    seekPreview.style.display = 'block';
+});
+
+progressBg.addEventListener('mouseleave', () => {
+    if (seekPreview) seekPreview.style.display = 'none';
+});
+
 video.addEventListener('timeupdate', () => {
     if (!isNaN(video.duration)) {
         const pct = (video.currentTime / video.duration) * 100;